@@ -1,6 +1,9 @@
+import sys
 from pathlib import Path
 import pandas as pd
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+
+from processing import store
 
 path_folder = Path(r"C:\Users\xavie\OneDrive\Documentos\pv-app\data_systemas")
 sfcr_folder = Path(r"C:\Users\xavie\OneDrive\Documentos\sfcr_aplicada")
@@ -8,10 +11,9 @@ sfcr_folder = Path(r"C:\Users\xavie\OneDrive\Documentos\sfcr_aplicada")
 loc = "pucp"
 daq = "DAQ-MS80S"
 
-daq_joined = pd.read_csv(path_folder / f"daq/daq_{loc}.csv")
-daq_joined["dt"] = pd.to_datetime(daq_joined["dt"])
+# daily parquet partitions, see first_population/migrate_history.py
+store_folder = path_folder / "store"
 
-daq_columns = daq_joined.columns.tolist()
 names = [
     "day",
     "time",
@@ -28,13 +30,24 @@ names = [
     "pyr",
 ]
 
-max_day = daq_joined["dt"].dt.date.max()
+max_day = store.last_day(store_folder, "daq", loc)
 today = date.today()
 # today = date(2022, 6, 18)
 
 print(max_day)
 
-for day in pd.date_range(max_day + timedelta(days=1), today):
+if max_day is not None:
+    first_day = max_day + timedelta(days=1)
+elif len(sys.argv) > 1:
+    # empty store, first day given as YYYY-MM-DD
+    first_day = date.fromisoformat(sys.argv[1])
+else:
+    # empty store, from the first raw file of the location
+    filepaths = sfcr_folder.glob(f"{loc.upper()}/*/*/{daq}-{loc.upper()}_*.csv")
+    stored = [datetime.strptime(p.stem[-10:], "%Y_%m_%d").date() for p in filepaths]
+    first_day = min(stored, default=today)
+
+for day in pd.date_range(first_day, today):
     print(day)
     filepath_daq = sfcr_folder / day.strftime(
         f"{loc.upper()}/%Y/%Y_%m/{daq}-{loc.upper()}_%Y_%m_%d.csv"
@@ -49,5 +62,4 @@ for day in pd.date_range(max_day + timedelta(days=1), today):
     dt_col = df.pop("dt")
     df.insert(0, "dt", dt_col)
 
-    daq_joined = pd.concat([daq_joined, df], ignore_index=True)
-daq_joined.to_csv(path_folder / f"daq/daq_{loc}.csv", index=False)
+    store.write_day(store_folder, "daq", loc, day.date(), df)
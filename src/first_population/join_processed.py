@@ -13,11 +13,8 @@ for (loc, mod) in systems:
     folderpath = cwd / "separated"
     files = folderpath.glob(f"{loc}_{mod}_*_joined.csv")
 
-    df_main = pd.DataFrame()
-
-    for f in files:
-        df = pd.read_csv(f)
-        df_main = pd.concat([df_main, df], ignore_index=True)
+    # every file is read first and concatenated once
+    df_main = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
 
     df_main["dt"] = pd.to_datetime(df_main["dt"], format="%Y-%m-%d %H:%M:%S")
     df_main.sort_values(by="dt", ignore_index=True, inplace=True)
@@ -28,11 +25,8 @@ for (loc, mod) in systems:
     folderpath = cwd / "separated"
     files = folderpath.glob(f"{loc}_{mod}_*_params.csv")
 
-    df_main = pd.DataFrame()
-
-    for f in files:
-        df = pd.read_csv(f)
-        df_main = pd.concat([df_main, df], ignore_index=True)
+    # every file is read first and concatenated once
+    df_main = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
 
     df_main["day"] = pd.to_datetime(df_main["day"], format="%Y-%m-%d")
     df_main.sort_values(by="day", ignore_index=True, inplace=True)
@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from processing import store
+
+# one time conversion of the daq_{loc}.csv and sfcr_{loc}_{mod}.csv histories
+# into the daily parquet store used by the other scripts
+path_folder = Path(r"C:\Users\Brando\Documents\pv-app\data_systemas")
+store_folder = path_folder / "store"
+
+locations = ["pucp", "uni", "untrm", "unaj", "unjbg", "unsa"]
+modules = ["perc", "hit", "cigs"]
+
+for loc in locations:
+    filepath = path_folder / f"daq/daq_{loc}.csv"
+    if not filepath.exists():
+        print(filepath, "doesn't exists")
+        continue
+    written = store.migrate_csv(filepath, store_folder, "daq", loc)
+    print(loc, len(written), "days")
+
+    for mod in modules:
+        filepath = path_folder / f"sfcr/sfcr_{loc}_{mod}.csv"
+        if not filepath.exists():
+            print(filepath, "doesn't exists")
+            continue
+        written = store.migrate_csv(filepath, store_folder, "sfcr", f"{loc}_{mod}")
+        print(loc, mod, len(written), "days")
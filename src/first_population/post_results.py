@@ -1,7 +1,8 @@
-import requests
 import pandas as pd
 from pathlib import Path
 
+from processing import client, kpi
+
 
 cwd = Path(r"D:\pucp\sfcr_aplicada\processed\joined")
 
@@ -15,6 +16,10 @@ systems = [
 
 api = "http://ec2-54-232-67-195.sa-east-1.compute.amazonaws.com:8000/processed"
 
+# rows of every system are collected, each column list is posted whole
+# on flush as before
+batch = client.Batch(api, size=None)
+
 for (loc, mod, pm) in systems:
     print(loc, mod)
     sys = f"{loc}-{mod}"
@@ -30,46 +35,30 @@ for (loc, mod, pm) in systems:
         df1 = df[["day", f"e_{type}"]].copy()
         df1.rename(columns={f"e_{type}": "val"}, inplace=True)
         dct = df1.to_dict("list")
-        dct["sys"] = sys
-        dct["type"] = type
-        response = requests.post(f"{api}/energies/", json=dct)
-        if response.status_code != 200:
-            print(f"Problem posting energy {type}")
+        batch.extend("energies", dict(sys=sys, type=type), dct)
 
     df1 = df[["day", "e_dc", "e_ac", "h"]].copy()
     dct = df1.to_dict("list")
-    dct["sys"] = sys
-    response = requests.post(f"{api}/efficiencies/", json=dct)
-    if response.status_code != 200:
-        print(f"Problem posting efficiencies")
+    batch.extend("efficiencies", dict(sys=sys), dct)
 
-    df1 = df.copy()
-    df1["y_r"] = df1["h"] / 1000
-    df1["y_a"] = df1["e_dc"] / pm
-    df1["y_f"] = df1["e_ac"] / pm
+    df1 = kpi.indicators(df, pm)
 
     for type in ["r", "a", "f"]:
         df2 = df1[["day", f"y_{type}"]].copy()
         df2.rename(columns={f"y_{type}": "val"}, inplace=True)
         df2 = df2.round(4)
         dct = df2.to_dict("list")
-        dct["sys"] = sys
-        dct["type"] = type
-        response = requests.post(f"{api}/yields/", json=dct)
-        if response.status_code != 200:
-            print(f"Problem posting yields {type}")
-
-    df1 = df.copy()
-    df1["y_r"] = df1["h_sync"] / 1000
-    df1["y_a"] = df1["e_dc_sync"] / pm
-    df1["y_f"] = df1["e_ac_sync"] / pm
+        batch.extend("yields", dict(sys=sys, type=type), dct)
+
+    df1 = df1[["day", "y_r_sync", "y_a_sync", "y_f_sync"]].rename(
+        columns=dict(y_r_sync="y_r", y_a_sync="y_a", y_f_sync="y_f")
+    )
     subset = ["y_r", "y_a", "y_f"]
-    df1 = df1[["day", "y_r", "y_a", "y_f"]]
     df1.dropna(subset=subset, how="all", inplace=True)
     df1 = df1.round(4)
 
     dct = df1.to_dict("list")
-    dct["sys"] = sys
-    response = requests.post(f"{api}/performance_ratios/", json=dct)
-    if response.status_code != 200:
-        print(f"Problem posting performance_ratios")
+    batch.extend("performance_ratios", dict(sys=sys), dct)
+
+batch.flush()
+client.get_client().close()
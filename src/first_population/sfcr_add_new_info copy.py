@@ -1,17 +1,21 @@
+import sys
 from pathlib import Path
 import pandas as pd
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+
+from processing import store
 
 path_folder = Path(r"C:\Users\xavie\OneDrive\Documentos\pv-app\data_systemas")
 sfcr_folder = Path(r"C:\Users\xavie\OneDrive\Documentos\sfcr_aplicada")
 
+# daily parquet partitions, see first_population/migrate_history.py
+store_folder = path_folder / "store"
+
 loc = "unsa"
 systems = ["perc", "hit", "cigs"]
 
 for sfcr, mod in enumerate(systems):
     sfcr += 1
-    df_joined = pd.read_csv(path_folder / f"sfcr/sfcr_{loc}_{mod}.csv")
-    df_joined["dt"] = pd.to_datetime(df_joined["dt"])
     names = [
         "day",
         "time",
@@ -26,10 +30,23 @@ for sfcr, mod in enumerate(systems):
         "s_ac",
     ]
 
-    max_day = df_joined["dt"].dt.date.max()
+    max_day = store.last_day(store_folder, "sfcr", f"{loc}_{mod}")
     today = date.today()
 
-    for day in pd.date_range(max_day + timedelta(days=1), today):
+    if max_day is not None:
+        first_day = max_day + timedelta(days=1)
+    elif len(sys.argv) > 1:
+        # empty store, first day given as YYYY-MM-DD
+        first_day = date.fromisoformat(sys.argv[1])
+    else:
+        # empty store, from the first raw file of the system
+        filepaths = sfcr_folder.glob(
+            f"{loc.upper()}/*/*/SFCR{sfcr}-{mod.upper()}-{loc.upper()}_*.csv"
+        )
+        stored = [datetime.strptime(p.stem[-10:], "%Y_%m_%d").date() for p in filepaths]
+        first_day = min(stored, default=today)
+
+    for day in pd.date_range(first_day, today):
         print(day)
         filepath = sfcr_folder / day.strftime(
             f"{loc.upper()}/%Y/%Y_%m/SFCR{sfcr}-{mod.upper()}-{loc.upper()}_%Y_%m_%d.csv"
@@ -44,5 +61,4 @@ for sfcr, mod in enumerate(systems):
         dt_col = df.pop("dt")
         df.insert(0, "dt", dt_col)
 
-        df_joined = pd.concat([df_joined, df], ignore_index=True)
-    df_joined.to_csv(path_folder / f"sfcr/sfcr_{loc}_{mod}.csv", index=False)
+        store.write_day(store_folder, "sfcr", f"{loc}_{mod}", day.date(), df)
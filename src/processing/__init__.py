@@ -1 +1,36 @@
-from . import filters, schemas, utils
+import importlib
+
+# submodules are imported on first access, importing the package itself
+# does not load pandas, numpy or requests
+__all__ = [
+    "backfill",
+    "bench",
+    "client",
+    "encode",
+    "filters",
+    "incremental",
+    "instrument",
+    "integrate",
+    "kpi",
+    "main",
+    "metadata",
+    "pipeline",
+    "quality",
+    "results",
+    "runner",
+    "schemas",
+    "series",
+    "store",
+    "synthetic",
+    "utils",
+]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,239 @@
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+# only the standard library is imported here, each command imports the
+# modules it needs so that `--help` and argument errors stay fast
+
+DEFAULT_CONFIG = Path(__file__).parent.parent / "config.json"
+
+
+def _days(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def run_day(args):
+    from . import main
+
+    if args.workers is not None and not args.concurrent:
+        raise SystemExit("--workers sets the threads of --concurrent, give both")
+    config = main.load_config(args.config)
+    # one client and one batch of KPI rows for the whole range
+    days = _days(args.start, args.end or args.start)
+    if args.concurrent:
+        import asyncio
+
+        from . import runner
+
+        asyncio.run(
+            runner.run_days(config, days, args.workers, args.locations, args.systems)
+        )
+    else:
+        main.run_days(config, days, args.locations, args.systems)
+
+
+def backfill(args):
+    from . import backfill, main, schemas
+
+    config = main.load_config(args.config)
+    backfill.run(
+        config,
+        args.store,
+        args.output,
+        args.start,
+        args.end or args.start,
+        args.locations or schemas.LOCATIONS,
+        args.modules or schemas.MODULES,
+        args.workers,
+    )
+
+
+def intraday(args):
+    from . import incremental, main
+
+    if args.end is not None and args.end != args.start:
+        raise SystemExit("intraday runs a single day, give only --start")
+    config = main.load_config(args.config)
+    incremental.run(config, args.state, args.start, args.locations, args.systems)
+
+
+def generate(args):
+    from . import main, synthetic
+
+    config = main.load_config(args.config)
+    days = _days(args.start, args.end or args.start)
+    synthetic.write(
+        args.output, config, days, args.locations, args.seed, overwrite=args.overwrite
+    )
+
+
+def benchmark(args):
+    import sys
+
+    from . import bench, main
+
+    config = main.load_config(args.config)
+    days = _days(args.start, args.end or args.start)
+
+    meta = None
+    if args.synthetic is not None:
+        from . import synthetic
+
+        # generated once, later runs time the same files
+        meta = synthetic.write(args.synthetic, config, days, args.locations)
+        config = config.copy(update=dict(local_folder=args.synthetic))
+
+    result = bench.run(
+        config,
+        days,
+        args.locations,
+        args.systems,
+        args.repeat,
+        meta,
+        ["block"] + ["rules"] * args.rules + ["legacy"] * args.legacy,
+        not args.no_memory,
+        bench.MICRO if args.micro else (),
+    )
+    bench.show(result)
+
+    if args.save is not None:
+        bench.save(result, args.save)
+    if args.baseline is not None:
+        regressions = bench.compare(result, bench.load(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(1)
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m processing",
+        description="Daily processing of the PV systems",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", type=Path, default=DEFAULT_CONFIG)
+    common.add_argument(
+        "--start", type=date.fromisoformat, default=date.today(), help="first day"
+    )
+    common.add_argument(
+        "--end", type=date.fromisoformat, help="last day, the start day if not set"
+    )
+    common.add_argument("--locations", nargs="+", help="all locations if not set")
+    common.add_argument(
+        "--metrics",
+        type=Path,
+        help="append per stage and per request events of the run as JSON lines",
+    )
+    common.add_argument("--profile", type=Path, help="write cProfile stats here")
+    common.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="peak Python memory of every stage, with tracemalloc",
+    )
+
+    sub = subparsers.add_parser(
+        "run-day", parents=[common], help="process and post every day of the range"
+    )
+    sub.add_argument("--systems", nargs="+", help="all systems if not set")
+    sub.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="use the asyncio runner, files are processed in --workers threads",
+    )
+    sub.add_argument(
+        "--workers", type=int, help="threads of --concurrent, only valid with it"
+    )
+    sub.set_defaults(func=run_day)
+
+    sub = subparsers.add_parser(
+        "intraday",
+        parents=[common],
+        help="post only the data appended to the files of --start since the last run",
+    )
+    sub.add_argument("--systems", nargs="+", help="all systems if not set")
+    sub.add_argument(
+        "--state", type=Path, required=True, help="folder of the state between runs"
+    )
+    sub.set_defaults(func=intraday)
+
+    sub = subparsers.add_parser(
+        "backfill",
+        parents=[common],
+        help="reprocess stored history over the range in parallel",
+    )
+    sub.add_argument("--modules", nargs="+", help="all modules if not set")
+    sub.add_argument("--store", type=Path, required=True)
+    sub.add_argument("--output", type=Path, required=True)
+    sub.add_argument("--workers", type=int, help="processes, one per CPU if not set")
+    sub.set_defaults(func=backfill)
+
+    sub = subparsers.add_parser(
+        "benchmark",
+        parents=[common],
+        help="time the stages of every system-day from local files, nothing is posted",
+    )
+    sub.add_argument("--systems", nargs="+", help="all systems if not set")
+    sub.add_argument("--repeat", type=int, default=3)
+    sub.add_argument(
+        "--synthetic",
+        type=Path,
+        help="generate the days into this folder and time them instead of local_folder",
+    )
+    sub.add_argument(
+        "--legacy", action="store_true", help="also time the original filter chain"
+    )
+    sub.add_argument(
+        "--rules",
+        action="store_true",
+        help="also time the block pipeline with the derivative rules on",
+    )
+    sub.add_argument("--no-memory", action="store_true", help="skip the memory pass")
+    sub.add_argument(
+        "--micro",
+        action="store_true",
+        help="also time single routines against the code they replaced",
+    )
+    sub.add_argument("--save", type=Path, help="write the result as a baseline")
+    sub.add_argument(
+        "--baseline", type=Path, help="fail on regressions against this baseline"
+    )
+    sub.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="relative slowdown or memory growth reported as a regression",
+    )
+    sub.set_defaults(func=benchmark)
+
+    sub = subparsers.add_parser(
+        "generate",
+        parents=[common],
+        help="write synthetic raw files of the range, see processing.synthetic",
+    )
+    sub.add_argument("--output", type=Path, required=True)
+    sub.add_argument("--seed", type=int, default=0)
+    sub.add_argument("--overwrite", action="store_true")
+    sub.set_defaults(func=generate)
+    return parser
+
+
+def main(argv: list[str] = None):
+    args = parser().parse_args(argv)
+    if not (args.metrics or args.profile or args.trace_memory):
+        args.func(args)
+        return
+
+    from . import instrument
+
+    instrument.configure(args.metrics, args.profile, args.trace_memory)
+    try:
+        args.func(args)
+    finally:
+        instrument.show(instrument.close())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import kpi, pipeline, quality, schemas, store, utils
+
+# histories attached by every worker, by (kind, name)
+_frames = dict()
+
+
+def minute_history(root: Path, kind: str, name: str, start, end, columns):
+    df = store.read(root, kind, name, start, end, columns)
+    df = (
+        df.groupby(pd.Grouper(key="dt", freq="min"))
+        .mean()
+        .dropna(how="all")
+        .reset_index(drop=False)
+    )
+    return df
+
+
+def share(df: pd.DataFrame):
+    # dt and values of a history in shared memory, workers attach them by name
+    dt = np.asarray(df["dt"], dtype="datetime64[ns]").view("i8")
+    values = df.drop(columns="dt").to_numpy(dtype=float)
+
+    blocks = list()
+    for arr in (dt, values):
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        blocks.append(shm)
+
+    spec = dict(
+        dt=(blocks[0].name, dt.shape),
+        values=(blocks[1].name, values.shape),
+        columns=df.columns.drop("dt").tolist(),
+    )
+    return spec, blocks
+
+
+def _attach(specs: dict):
+    for key, spec in specs.items():
+        name, shape = spec["dt"]
+        dt_shm = shared_memory.SharedMemory(name=name)
+        dt = np.ndarray(shape, dtype="i8", buffer=dt_shm.buf)
+
+        name, shape = spec["values"]
+        val_shm = shared_memory.SharedMemory(name=name)
+        values = np.ndarray(shape, dtype=float, buffer=val_shm.buf)
+
+        _frames[key] = (dt, values, spec["columns"], dt_shm, val_shm)
+
+
+def _day_frame(key: tuple, day: date):
+    dt, values, columns, _, _ = _frames[key]
+    start = pd.Timestamp(day).value
+    lo, hi = np.searchsorted(dt, [start, start + utils.DAY_NS])
+
+    df = pd.DataFrame(values[lo:hi], columns=columns)
+    df.insert(0, "dt", dt[lo:hi].view("datetime64[ns]"))
+    return df
+
+
+def _system_day(task: tuple):
+    loc, mod, day, irr_colname, ranges, derivatives = task
+    df_daq = _day_frame(("daq", loc), day)
+    df_sfcr = _day_frame(("sfcr", f"{loc}_{mod}"), day)
+
+    p_m = schemas.NOMINAL_POWERS[mod]
+    report = quality.Report()
+    df_joined = pipeline.system_day(
+        df_daq,
+        df_sfcr,
+        irr_colname,
+        mod,
+        p_m,
+        day,
+        ranges,
+        report,
+        derivatives,
+        loc=loc,
+        sys=f"{loc}-{mod}",
+    )
+    return df_joined, report.frame()
+
+
+def run(
+    config: schemas.Configuration,
+    root: Path,
+    output: Path,
+    start: date,
+    end: date,
+    locations: list[str] = schemas.LOCATIONS,
+    modules: list[str] = schemas.MODULES,
+    workers: int = None,
+):
+    days = [day.date() for day in pd.date_range(start, end)]
+
+    specs, blocks = dict(), list()
+    for loc in locations:
+        irr_colname = config.irr_colname.__getattribute__(loc)
+        columns = [irr_colname]
+        columns += [f"t_mod_{s}_{mod}" for mod in modules for s in ["c", "s"]]
+        df = minute_history(root, "daq", loc, start, end, columns)
+        specs[("daq", loc)], shms = share(df)
+        blocks.extend(shms)
+
+        for mod in modules:
+            name = f"{loc}_{mod}"
+            df = minute_history(root, "sfcr", name, start, end, ["p_dc", "p_ac"])
+            specs[("sfcr", name)], shms = share(df)
+            blocks.extend(shms)
+
+    tasks = [
+        (
+            loc,
+            mod,
+            day,
+            config.irr_colname.__getattribute__(loc),
+            config.ranges,
+            config.derivatives,
+        )
+        for loc in locations
+        for mod in modules
+        for day in days
+    ]
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach, initargs=(specs,)
+        ) as executor:
+            # results come back in the order of the tasks
+            chunksize = max(1, len(tasks) // (4 * (workers or 1)))
+            results = list(executor.map(_system_day, tasks, chunksize=chunksize))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    output.mkdir(parents=True, exist_ok=True)
+    n = len(days)
+    for i, (loc, mod) in enumerate((loc, mod) for loc in locations for mod in modules):
+        print(loc, mod)
+        system_results = results[i * n : (i + 1) * n]
+
+        df_joined = pd.concat([df for df, _ in system_results], ignore_index=True)
+        df_params = kpi.daily_integrals(df_joined, days=days)
+        df_quality = pd.concat([df for _, df in system_results], ignore_index=True)
+
+        filename = f"{loc}_{mod}_{start}_{end}_joined.csv"
+        df_joined.to_csv(output / filename, index=False)
+        filename = f"{loc}_{mod}_{start}_{end}_params.csv"
+        df_params.to_csv(output / filename, index=False)
+        filename = f"{loc}_{mod}_{start}_{end}_quality.parquet"
+        df_quality.to_parquet(output / filename, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reprocess stored history over a date range in parallel"
+    )
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--locations", nargs="+", default=schemas.LOCATIONS)
+    parser.add_argument("--modules", nargs="+", default=schemas.MODULES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--store", type=Path, required=True)
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument(
+        "--config", type=Path, default=Path(__file__).parent.parent / "config.json"
+    )
+    args = parser.parse_args()
+
+    config = schemas.Configuration(**json.load(open(args.config)))
+    run(
+        config,
+        args.store,
+        args.output,
+        args.start,
+        args.end,
+        args.locations,
+        args.modules,
+        args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
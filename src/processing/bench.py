@@ -0,0 +1,379 @@
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import encode, filters, metadata, pipeline, schemas, utils
+
+# cases timed stage by stage on every system-day: the block pipeline of
+# main.py and the original per variable chain (filters.irradiance /
+# module_temperatures / power, corroborate_measurement, outer merges,
+# utils.get_params and the json module), kept as the reference of the speedups. rules is the block
+# pipeline with the derivative rules the original filters had commented out
+STAGES = dict(
+    block=["read", "filter", "series", "params", "encode"],
+    rules=["read", "filter", "series", "params", "encode"],
+    legacy=["read", "filter", "quality", "join", "params", "encode"],
+)
+
+# stages faster than this are not reported as regressions, timer noise
+MIN_SECONDS = 0.005
+
+
+def _timed(timings: dict, stage: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage] += time.perf_counter() - start
+    return result
+
+
+def _read(config, day: date, loc, systems, sys, timings: dict, usecols=True):
+    # as main.py, the DAQ columns of every system of the location are parsed
+    # once and the frame is shared through the read cache
+    irr_colname = config.irr_colname.__getattribute__(loc.loc)
+    df_daq = _timed(
+        timings, "read", utils.read_daq, config, day, loc.loc, systems, usecols
+    )
+
+    sfcr_filepath = utils.sfcr_filepath(
+        config.local_folder, sys.loc, sys.sfcr, sys.mod, day
+    )
+    df_sfcr = _timed(
+        timings,
+        "read",
+        utils.read_file,
+        sfcr_filepath,
+        config.sfcr_colnames,
+        day,
+        sys.loc,
+        ["p_dc", "p_ac"] if usecols else None,
+    )
+    return df_daq, df_sfcr, irr_colname
+
+
+def block_day(config: schemas.Configuration, day: date, loc, systems, sys, timings):
+    # one system-day as main.py runs it, everything but the POST requests
+    df_daq, df_sfcr, irr_colname = _read(config, day, loc, systems, sys, timings)
+
+    block = _timed(
+        timings,
+        "filter",
+        pipeline.system_block,
+        df_daq,
+        df_sfcr,
+        irr_colname,
+        sys.mod,
+        sys.p_m,
+        day,
+        config.ranges,
+        None,
+        config.derivatives,
+    )
+    variables = _timed(timings, "series", pipeline.block_series, block, day)
+    params = _timed(timings, "params", pipeline.block_params, block, day)
+
+    payloads = [s.to_json() for s in variables.values()]
+    _timed(timings, "encode", encode.dumps, payloads)
+    return params
+
+
+def _legacy_join(frames: dict):
+    df_joined = pd.DataFrame(columns=["dt"])
+    for var, df in frames.items():
+        df = df[["dt", "val"]].rename(columns={"val": var})
+        df_joined = pd.merge(df_joined, df, on="dt", how="outer")
+    df_joined.sort_values(by="dt", inplace=True, ignore_index=True)
+    return df_joined
+
+
+def _legacy_encode(frames: dict):
+    # request bodies as utils posted them before encode: string dates, lists
+    # of python objects and the json module, as requests encodes json=
+    bodies = list()
+    for df in frames.values():
+        df = df.sort_values("dt", ignore_index=True)
+        df["dt"] = df["dt"].astype(str)
+        dct = df.to_dict("list")
+        bodies.append(json.dumps(dct, allow_nan=False).encode("utf-8"))
+    return bodies
+
+
+def legacy_day(config: schemas.Configuration, day: date, loc, systems, sys, timings):
+    # one system-day through the original filter chain, whole files parsed
+    df_daq, df_sfcr, irr_colname = _read(config, day, loc, systems, sys, timings, False)
+
+    def chain():
+        irr = utils.get_variable(df_daq, irr_colname)
+        t_mod_c = utils.get_variable(df_daq, f"t_mod_c_{sys.mod}")
+        t_mod_s = utils.get_variable(df_daq, f"t_mod_s_{sys.mod}")
+        p_dc = utils.get_variable(df_sfcr, "p_dc")
+        p_ac = utils.get_variable(df_sfcr, "p_ac")
+        return dict(
+            irr=filters.irradiance(irr["dt"], irr["val"], day),
+            t_mod=filters.module_temperatures(
+                t_mod_c["dt"], t_mod_c["val"], t_mod_s["dt"], t_mod_s["val"], day
+            ),
+            p_dc=filters.power(p_dc["dt"], p_dc["val"], sys.p_m, day),
+            p_ac=filters.power(p_ac["dt"], p_ac["val"], sys.p_m, day),
+        )
+
+    def corroborate(frames):
+        return {
+            var: (
+                df
+                if not filters.corroborate_measurement(df["dt"].tolist(), day)
+                else pd.DataFrame(columns=["dt", "val"])
+            )
+            for var, df in frames.items()
+        }
+
+    def params(df_joined):
+        df = df_joined.astype({var: float for var in ["irr", "p_dc", "p_ac"]})
+        params = utils.get_params(df)
+        sync = utils.get_params(df, subset=["irr", "p_ac"])
+        return dict(
+            day=day,
+            h=params["h"],
+            e_dc=params["e_dc"],
+            e_ac=params["e_ac"],
+            h_sync=sync["h"],
+            e_dc_sync=sync["e_dc"],
+            e_ac_sync=sync["e_ac"],
+        )
+
+    frames = _timed(timings, "filter", chain)
+    frames = _timed(timings, "quality", corroborate, frames)
+    df_joined = _timed(timings, "join", _legacy_join, frames)
+    result = _timed(timings, "params", params, df_joined)
+    _timed(timings, "encode", _legacy_encode, frames)
+    return result
+
+
+RULES = schemas.Derivatives(
+    irr=schemas.Derivative(dead=0.0001, dead_lower_limit=5, abrupt=800),
+    t_mod=schemas.Derivative(dead=0.0001, abrupt=4),
+    p=schemas.Derivative(abrupt=0.8),
+)
+
+
+def rules_day(config: schemas.Configuration, day: date, loc, systems, sys, timings):
+    config = config.copy(update=dict(derivatives=RULES))
+    return block_day(config, day, loc, systems, sys, timings)
+
+
+CASES = dict(block=block_day, rules=rules_day, legacy=legacy_day)
+
+
+def _best(repeat: int, func, *args):
+    # best wall time of repeat calls
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def _legacy_restamp(dt: pd.Series, day: date):
+    # as the filters did before filters.restamp, a string round trip per row
+    date_string = day.strftime("%Y-%m-%d")
+    return pd.to_datetime(date_string + " " + dt.dt.strftime("%H:%M:%S"))
+
+
+def restamp_micro(repeat: int):
+    # a full day of 1 Hz timestamps with sub-second jitter moved to another day
+    rng = np.random.default_rng(0)
+    seconds = np.arange(utils.MINUTES * 60) + rng.uniform(0, 0.5, utils.MINUTES * 60)
+    dt = pd.Series(pd.Timestamp(2024, 3, 1) + pd.to_timedelta(seconds, unit="s"))
+    day = date(2024, 3, 2)
+    return dict(
+        legacy=_best(repeat, _legacy_restamp, dt, day),
+        restamp=_best(repeat, filters.restamp, dt, day),
+    )
+
+
+def _legacy_concat(frames: list[pd.DataFrame]):
+    # as the join scripts did, every day recopies the days before it
+    df_main = pd.DataFrame()
+    for df in frames:
+        df_main = pd.concat([df_main, df], ignore_index=True)
+    return df_main
+
+
+def _collect_concat(frames: list[pd.DataFrame]):
+    return pd.concat(frames, ignore_index=True)
+
+
+def concat_micro(repeat: int, sizes=(91, 182, 365)):
+    # joined minute frames of a synthetic quarter, half year and year, the
+    # collected variant grows linearly with the days, the legacy one doesn't
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp(2024, 1, 1)
+    minutes = pd.to_timedelta(np.arange(utils.MINUTES), unit="min")
+    frames = list()
+    for i in range(max(sizes)):
+        df = pd.DataFrame(rng.random((utils.MINUTES, 4)), columns=pipeline.VARIABLES)
+        df.insert(0, "dt", start + pd.Timedelta(days=i) + minutes)
+        frames.append(df)
+
+    seconds = dict()
+    for n in sizes:
+        seconds[f"legacy_{n}"] = _best(repeat, _legacy_concat, frames[:n])
+        seconds[f"collect_{n}"] = _best(repeat, _collect_concat, frames[:n])
+    return seconds
+
+
+# benchmarks of single routines against the code they replaced, on
+# generated inputs: functions of repeat returning the best seconds by variant
+MICRO = dict(restamp=restamp_micro, concat=concat_micro)
+
+
+def _params_json(params: dict):
+    return {
+        key: None if value is None else round(float(value), 4)
+        for key, value in params.items()
+        if key != "day"
+    }
+
+
+def run(
+    config: schemas.Configuration,
+    days: list[date],
+    locations: list[str] = None,
+    systems: list[str] = None,
+    repeat: int = 3,
+    meta: metadata.Metadata = None,
+    cases: tuple[str, ...] = ("block",),
+    memory: bool = True,
+    micro: tuple[str, ...] = (),
+):
+    # best of `repeat` wall times of every stage and of whole system-days,
+    # files are parsed again on every repetition. The peak memory of a
+    # system-day is traced in a separate pass, tracing slows everything down
+    meta = meta or metadata.load(config)
+    selected = [
+        (day, loc, loc_systems, sys)
+        for day in days
+        for loc, loc_systems in meta.select(locations, systems)
+        for sys in loc_systems
+    ]
+
+    result = dict(system_days=len(selected), repeat=repeat, cases=dict())
+    for case in cases:
+        func = CASES[case]
+        best = dict()
+        for _ in range(repeat):
+            utils.clear_read_cache()
+            timings = defaultdict(float)
+            start = time.perf_counter()
+            for day, loc, loc_systems, sys in selected:
+                func(config, day, loc, loc_systems, sys, timings)
+            timings["total"] = time.perf_counter() - start
+            for stage, seconds in timings.items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+
+        utils.clear_read_cache()
+        peak, params = None, dict()
+        if memory:
+            tracemalloc.start()
+        for day, loc, loc_systems, sys in selected:
+            if memory:
+                tracemalloc.reset_peak()
+            timings = defaultdict(float)
+            key = f"{sys.sys}/{day}"
+            params[key] = _params_json(
+                func(config, day, loc, loc_systems, sys, timings)
+            )
+            if memory:
+                peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+        if memory:
+            tracemalloc.stop()
+
+        result["cases"][case] = dict(seconds=best, peak_memory=peak, params=params)
+
+    result["micro"] = {name: MICRO[name](repeat) for name in micro}
+    return result
+
+
+def show(result: dict):
+    print(f"{result['system_days']} system-days, best of {result['repeat']}")
+    for case, values in result["cases"].items():
+        print(case)
+        seconds = values["seconds"]
+        for stage in STAGES[case] + ["total"]:
+            print(f"{stage:>10} {seconds.get(stage, 0) * 1000:10.1f} ms")
+        if values["peak_memory"] is not None:
+            print(f"{'peak':>10} {values['peak_memory'] / 2**20:10.1f} MiB")
+    for name, seconds in result.get("micro", {}).items():
+        print(name)
+        for variant, value in seconds.items():
+            print(f"{variant:>10} {value * 1000:10.1f} ms")
+
+
+def save(result: dict, path: Path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+
+def load(path: Path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _same(a, b, rtol: float):
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) <= rtol * max(abs(a), abs(b), 1)
+
+
+def compare(result: dict, baseline: dict, tolerance: float = 0.25, rtol=1e-6):
+    # regressions against a saved result: stages or peak memory more than
+    # `tolerance` above the baseline, and results that changed
+    regressions = list()
+    for case, values in result["cases"].items():
+        base = baseline["cases"].get(case)
+        if base is None:
+            continue
+
+        for stage, seconds in values["seconds"].items():
+            limit = base["seconds"].get(stage, 0) * (1 + tolerance)
+            if seconds > max(limit, MIN_SECONDS):
+                ratio = (
+                    seconds / base["seconds"][stage] if stage in base["seconds"] else 0
+                )
+                regressions.append(f"{case} {stage}: {ratio:.2f}x slower")
+
+        peak, base_peak = values["peak_memory"], base["peak_memory"]
+        if peak is not None and base_peak is not None:
+            if peak > base_peak * (1 + tolerance):
+                regressions.append(f"{case} peak memory: {peak / base_peak:.2f}x")
+
+        for key, params in values["params"].items():
+            base_params = base["params"].get(key)
+            if base_params is None:
+                continue
+            changed = [
+                name
+                for name, value in params.items()
+                if not _same(value, base_params.get(name), rtol)
+            ]
+            if changed:
+                regressions.append(f"{case} {key}: {', '.join(changed)} changed")
+
+    for name, seconds in result.get("micro", {}).items():
+        base = baseline.get("micro", {}).get(name, {})
+        for variant, value in seconds.items():
+            if variant not in base:
+                continue
+            if value > max(base[variant] * (1 + tolerance), MIN_SECONDS):
+                ratio = value / base[variant]
+                regressions.append(f"{name} {variant}: {ratio:.2f}x slower")
+    return regressions
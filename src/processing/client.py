@@ -0,0 +1,281 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import encode, instrument, results
+
+# retried on top of connection errors, with exponential backoff
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# POSTs insert rows, a POST whose response was lost is not sent again or
+# the rows would be inserted twice. They are retried on connection errors
+# and on these statuses only, the API refused them without handling them
+RETRY_POST_STATUS = (429, 503)
+
+
+class _Retry(Retry):
+    def is_retry(self, method: str, status_code: int, has_retry_after=False):
+        if method.upper() == "POST":
+            return bool(self.total) and status_code in RETRY_POST_STATUS
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class Client:
+    """Shared HTTP session with a connection pool and a thread pool for POSTs.
+
+    `post` returns immediately with a future; `wait` blocks until every
+    submitted request has finished. Payloads are encoded by `encode.body`,
+    gzip compressed when `compress` is set. With a `results.Results` store,
+    every request is written to its outbox before it is sent and removed
+    once the API accepts it; `replay` sends what earlier runs left there.
+    While the outbox can't be emptied, requests are only written to it.
+    The store is closed with the client.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        retries: int = 3,
+        backoff: float = 0.5,
+        compress: bool = False,
+        results=None,
+    ):
+        retry = _Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=workers, pool_maxsize=workers, max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.compress = compress
+        self.results = results
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending: list[Future] = []
+        # requests of earlier runs still undelivered, see replay
+        self.held = False
+
+    def _send(self, url: str, json, callback, body=None, entry=None):
+        data, headers = body or encode.body(json, self.compress)
+        recorder = instrument.active()
+        try:
+            if recorder is None:
+                response = self.session.post(url, data=data, headers=headers)
+            else:
+                response = self._recorded(recorder, url, json or {}, data, headers)
+        except requests.RequestException as e:
+            if entry is not None:
+                self.results.failed(entry, error=str(e))
+            raise
+
+        if entry is not None:
+            if response.status_code == 200:
+                self.results.delivered(entry)
+            else:
+                self.results.failed(entry, response.status_code)
+        if callback is not None:
+            callback(response)
+        return response
+
+    def _recorded(self, recorder, url: str, json, data: bytes, headers: dict):
+        # latency, status and retries of the request, labelled as its payload
+        labels = {k: json[k] for k in ["loc", "sys", "type"] if k in json}
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, data=data, headers=headers)
+        except requests.RequestException as e:
+            seconds = time.perf_counter() - start
+            recorder.request(url, seconds, bytes=len(data), error=str(e), **labels)
+            raise
+        seconds = time.perf_counter() - start
+
+        retries = getattr(response.raw, "retries", None)
+        recorder.request(
+            url,
+            seconds,
+            bytes=len(data),
+            status=response.status_code,
+            retries=len(retries.history) if retries is not None else 0,
+            **labels,
+        )
+        return response
+
+    def post(self, url: str, json, callback=None) -> Future:
+        body = entry = None
+        if self.results is not None:
+            # in the outbox before it is sent, within the caller's transaction
+            body = encode.body(json, self.compress)
+            entry = self.results.put(url, *body)
+            if self.held:
+                # sent by a later replay, after the requests queued before it
+                future = Future()
+                future.set_result(None)
+                return future
+        future = self.executor.submit(self._send, url, json, callback, body, entry)
+        self.pending.append(future)
+        return future
+
+    def replay(self) -> int:
+        # requests left in the outbox by earlier runs, to be called before
+        # this run posts anything. They are sent one after another in the
+        # order they were queued, so an older body never lands after a newer
+        # one. The first that fails again stops the replay and the requests
+        # of this run are queued behind it. Returns the requests delivered
+        if self.results is None:
+            return 0
+        delivered = 0
+        for entry, url, data, headers in self.results.pending():
+            try:
+                response = self._send(url, None, None, (data, headers), entry)
+            except requests.RequestException as e:
+                print(f"POST failed: {e}")
+                response = None
+            if response is not None and response.status_code == 200:
+                delivered += 1
+            elif not self.results.rejected(entry):
+                self.held = True
+                break
+        return delivered
+
+    def wait(self):
+        pending, self.pending = self.pending, []
+        wait_futures(pending)
+
+        responses = list()
+        for future in pending:
+            try:
+                responses.append(future.result())
+            except requests.RequestException as e:
+                print(f"POST failed: {e}")
+        return responses
+
+    def close(self):
+        self.wait()
+        self.executor.shutdown()
+        self.session.close()
+        if self.results is not None:
+            self.results.close()
+
+
+_client = None
+
+
+def get_client() -> Client:
+    global _client
+    if _client is None:
+        _client = Client()
+    return _client
+
+
+def configure(
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    compress: bool = False,
+    results=None,
+):
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = Client(
+        workers=workers,
+        retries=retries,
+        backoff=backoff,
+        compress=compress,
+        results=results,
+    )
+    return _client
+
+
+def from_config(config) -> Client:
+    # client of a run, with the http settings and the results store of config
+    return configure(
+        workers=config.http.workers,
+        retries=config.http.retries,
+        backoff=config.http.backoff,
+        compress=config.http.gzip,
+        results=results.from_config(config),
+    )
+
+
+def replay_outbox(http: Client) -> int:
+    # requests an earlier run could not deliver go first, returns once they
+    # are delivered or the API failed them again
+    replayed = http.replay()
+    if replayed:
+        print(f"{replayed} requests from the outbox sent again")
+    if http.held:
+        print("outbox not emptied, the requests of this run are queued behind it")
+    return replayed
+
+
+class Batch:
+    """Accumulates daily KPI rows and uploads them as column lists.
+
+    Rows sharing the endpoint and the scalar fields (sys, type) are merged
+    into one request, sent once `size` rows are collected or on `flush`,
+    only on `flush` when `size` is None.
+    When the client has a results store, rows queued before with the same
+    values are skipped.
+    """
+
+    def __init__(self, api_url: str, size: int = 500, client: Client = None):
+        self.api_url = api_url
+        self.size = size
+        self.client = client
+        self.columns: dict[tuple, dict[str, list]] = dict()
+
+    def add(self, endpoint: str, fixed: dict, row: dict):
+        self.extend(endpoint, fixed, {k: [v] for k, v in row.items()})
+
+    def extend(self, endpoint: str, fixed: dict, columns: dict[str, list]):
+        results = (self.client or get_client()).results
+        if results is not None:
+            changed = results.kpi_changed(endpoint, fixed, columns)
+            if not changed:
+                return
+            columns = {k: [vals[i] for i in changed] for k, vals in columns.items()}
+
+        key = (endpoint, tuple(fixed.items()))
+        cols = self.columns.setdefault(key, {k: [] for k in columns})
+        for k, vals in columns.items():
+            cols[k].extend(vals)
+
+        while self.size is not None and len(cols["day"]) >= self.size:
+            self._send(key, {k: v[: self.size] for k, v in cols.items()})
+            for k in cols:
+                del cols[k][: self.size]
+
+    def _send(self, key: tuple, cols: dict[str, list]):
+        endpoint, fixed = key
+        json = dict(fixed)
+        json.update(cols)
+
+        def check(response):
+            if response.status_code != 200:
+                print(f"{endpoint} POST response {response.status_code}")
+                print(json)
+
+        client = self.client or get_client()
+        if client.results is None:
+            return client.post(f"{self.api_url}/{endpoint}/", json, check)
+        # rows are recorded with the request written to the outbox
+        with client.results.transaction():
+            client.results.kpi_queued(endpoint, dict(fixed), cols)
+            return client.post(f"{self.api_url}/{endpoint}/", json, check)
+
+    def flush(self):
+        for key, cols in self.columns.items():
+            if cols["day"]:
+                self._send(key, cols)
+        self.columns = dict()
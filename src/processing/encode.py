@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dt_strings(dt) -> np.ndarray:
+    # "YYYY-MM-DD HH:MM:SS" strings, as astype(str) of whole second timestamps,
+    # written as character codes: the date once per distinct day and the time
+    # from the seconds of the day
+    dt = np.asarray(dt, dtype="datetime64[s]")
+    day = dt.astype("datetime64[D]")
+    seconds = (dt - day).astype(np.int32)
+
+    days, codes = np.unique(day, return_inverse=True)
+    dates = np.datetime_as_string(days, unit="D").astype("U10")
+
+    chars = np.empty((len(dt), 19), dtype=np.uint32)
+    chars[:, :10] = dates.view(np.uint32).reshape(len(days), 10)[codes.ravel()]
+    chars[:, 10] = ord(" ")
+    chars[:, [13, 16]] = ord(":")
+    for pos, value in [
+        (11, seconds // 3600),
+        (14, seconds // 60 % 60),
+        (17, seconds % 60),
+    ]:
+        chars[:, pos] = value // 10 + ord("0")
+        chars[:, pos + 1] = value % 10 + ord("0")
+    return chars.view("U19").ravel()
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    # payloads may hold numpy arrays, orjson writes numeric ones directly
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default).encode()
+
+
+def body(obj, compress: bool = False):
+    # request body and headers of a JSON payload, gzip compressed if asked
+    data = dumps(obj)
+    headers = {"Content-Type": "application/json"}
+    if compress:
+        data = gzip.compress(data, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return data, headers
@@ -1,8 +1,16 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, date, timedelta, time
 import logging
 
 
+def restamp(dt: pd.Series, day: date):
+    # move every timestamp to the same time of day (whole seconds) on day
+    dt = pd.to_datetime(dt)
+    offset = (dt - dt.dt.normalize()).dt.floor("s")
+    return pd.Timestamp(day) + offset
+
+
 def select_range(df: pd.DataFrame, column: str, lower_limit: float, upper_limit: float):
     df = df[(lower_limit <= df[column]) & (df[column] <= upper_limit)]
     logging.info(f"Selected range filter, new len: {df.__len__()}")
@@ -33,15 +41,60 @@ def abrupt_change(df: pd.DataFrame, upper_limit: float):
     return df
 
 
+# rules hit by a value, as recorded by pipeline.filter_block
+BELOW, ABOVE, DEAD, ABRUPT, STUCK = -1, 1, 2, 3, 4
+
+
+def stuck_values(val: np.ndarray, n: int):
+    # values in runs of at least n identical consecutive readings, in one pass
+    starts = np.flatnonzero(np.r_[True, val[1:] != val[:-1]])
+    lengths = np.diff(np.r_[starts, len(val)])
+    return np.repeat(lengths >= n, lengths)
+
+
+def derivative_rules(
+    seconds: np.ndarray,
+    val: np.ndarray,
+    dead: float = None,
+    dead_lower_limit: float = None,
+    abrupt: float = None,
+    stuck: int = None,
+):
+    # DEAD, ABRUPT or STUCK for every value hitting a rule, 0 otherwise.
+    # rates are |dval/dt| per second between consecutive non nan values, as
+    # derivative, dead_values and abrupt_change; the first value has no rate
+    # and is kept
+    codes = np.zeros(len(val), dtype=np.int8)
+    idx = np.flatnonzero(~np.isnan(val))
+    if len(idx) == 0:
+        return codes
+    val, seconds = val[idx], seconds[idx]
+    hits = np.zeros(len(val), dtype=np.int8)
+
+    if dead is not None or abrupt is not None:
+        rate = np.empty(len(val))
+        rate[0] = np.nan
+        rate[1:] = np.abs(np.diff(val)) / np.diff(seconds)
+        with np.errstate(invalid="ignore"):
+            if dead is not None:
+                mask = rate < dead
+                if dead_lower_limit is not None:
+                    mask &= dead_lower_limit < val
+                hits[mask] = DEAD
+            if abrupt is not None:
+                hits[abrupt < rate] = ABRUPT
+    if stuck is not None:
+        hits[stuck_values(val, stuck)] = STUCK
+
+    codes[idx] = hits
+    return codes
+
+
 def irradiance(dt: list[datetime], val: list[float], day: date):
     df = pd.DataFrame(dict(dt=dt, val=val))
     df["dt"] = pd.to_datetime(df["dt"])
 
-    df["date"] = day.strftime("%Y-%m-%d")
-    df["time"] = df["dt"].dt.strftime("%H:%M:%S")
-    df["dt"] = df["date"] + " " + df["time"]
-
-    df["dt"] = pd.to_datetime(df["dt"])
+    df["dt"] = restamp(df["dt"], day)
 
     logging.info(f"Irradiance len: {df.__len__()}")
 
@@ -64,15 +117,6 @@ def irradiance(dt: list[datetime], val: list[float], day: date):
         upper_limit=2000,
     )
 
-    # df["derivative"] = derivative(df, column="val")
-    # df = dead_values(
-    #     df,
-    #     derivative=0.0001,
-    #     column="val",
-    #     lower_limit=5,
-    # )
-    # df = abrupt_change(df, upper_limit=800)
-
     df.dropna(inplace=True)
     df["val"] = df["val"].round(4)
     return df
@@ -87,11 +131,7 @@ def module_temperature(dt: list[datetime], val: list[float], day: date):
     if df.empty:
         return pd.DataFrame(columns=["dt", "val"])
 
-    df["date"] = day.strftime("%Y-%m-%d")
-    df["time"] = df["dt"].dt.strftime("%H:%M:%S")
-    df["dt"] = df["date"] + " " + df["time"]
-
-    df["dt"] = pd.to_datetime(df["dt"])
+    df["dt"] = restamp(df["dt"], day)
 
     # resample per minute basis
     df = df.resample("1min", on="dt").mean().reset_index()
@@ -106,10 +146,6 @@ def module_temperature(dt: list[datetime], val: list[float], day: date):
         upper_limit=70,
     )
 
-    # df["derivative"] = derivative(df, column="val")
-    # df = dead_values(df, derivative=0.0001)
-    # df = abrupt_change(df, upper_limit=4)
-
     df.dropna(inplace=True)
     df["val"] = df["val"].round(4)
     return df
@@ -155,11 +191,7 @@ def power(dt: list[datetime], val: list[float], p_m: float, day: date):
     if df.empty:
         return pd.DataFrame(columns=["dt", "val"])
 
-    df["date"] = day.strftime("%Y-%m-%d")
-    df["time"] = df["dt"].dt.strftime("%H:%M:%S")
-    df["dt"] = df["date"] + " " + df["time"]
-
-    df["dt"] = pd.to_datetime(df["dt"])
+    df["dt"] = restamp(df["dt"], day)
 
     # resample per minute basis
     df = df.resample("1min", on="dt").mean().reset_index()
@@ -173,9 +205,6 @@ def power(dt: list[datetime], val: list[float], p_m: float, day: date):
         upper_limit=1.05 * p_m,
     )
 
-    # df["derivative"] = derivative(df, column="val")
-    # df = abrupt_change(df, upper_limit=0.8 * p_m)
-
     df.dropna(inplace=True)
     df["val"] = df["val"].round(4)
     return df
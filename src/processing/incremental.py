@@ -0,0 +1,237 @@
+import argparse
+import io
+import json
+import pickle
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from . import client, integrate, metadata, pipeline, schemas, series, utils
+
+# intraday mode, meant to run every few minutes: only the rows appended to the
+# raw files since the previous tick are parsed and only the new minutes posted.
+# the quality checks need the whole day, so the daily main.py run remains
+# the final pass over each day.
+
+
+class TailReader:
+    """Per minute sums and counts of a raw file that keeps growing.
+
+    `read` parses only the bytes appended since the previous call.
+    """
+
+    def __init__(self, filepath: Path, names: list[str], columns: list[str]):
+        self.filepath = Path(filepath)
+        self.names = names
+        # columns missing from the layout of the file read as empty
+        self.columns = [name for name in columns if name in names]
+        self.offset = 0
+        self.sums = np.zeros((utils.MINUTES, len(self.columns)))
+        self.counts = np.zeros((utils.MINUTES, len(self.columns)), dtype=np.int64)
+        self.last = -1
+
+    def read(self):
+        try:
+            if self.filepath.stat().st_size < self.offset:
+                # file was rewritten, start over
+                self.__init__(self.filepath, self.names, self.columns)
+            with open(self.filepath, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # a line still being written is left for the next read
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+        self.offset += end
+
+        source = io.BytesIO(data[:end])
+        last = utils.fold_csv(
+            source, self.names, self.columns, self.sums, self.counts, None
+        )
+        self.last = max(self.last, last)
+
+    @property
+    def complete(self):
+        # the last minute seen may still receive samples
+        return self.last - 1
+
+    def means(self, columns: list[str]):
+        block = np.full((utils.MINUTES, len(columns)), np.nan)
+        with np.errstate(invalid="ignore"):
+            for i, col in enumerate(columns):
+                if col in self.columns:
+                    j = self.columns.index(col)
+                    block[:, i] = self.sums[:, j] / self.counts[:, j]
+        return block
+
+
+def load_state(state_folder: Path, day: date):
+    path = state_folder / f"{day}.pkl"
+    if path.exists():
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    return dict(readers=dict(), posted=dict(), integrals=dict(), kpis=dict())
+
+
+def save_state(state_folder: Path, day: date, state: dict):
+    state_folder.mkdir(parents=True, exist_ok=True)
+    path = state_folder / f"{day}.pkl"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f)
+    tmp.replace(path)
+
+    # states of previous days are not needed anymore
+    for old in state_folder.glob("*.pkl"):
+        if old != path:
+            old.unlink()
+
+
+def _new_minutes(state: dict, key: str, values: np.ndarray, complete: int):
+    # minutes with a value after the last posted one, up to the last complete one
+    start = state["posted"].get(key, -1) + 1
+    integral = state["integrals"].setdefault(key, integrate.Trapezoid())
+    if complete < start:
+        # no minute completed since the last post, or none seen yet
+        return np.empty(0, dtype=np.int64)
+
+    slots = start + np.flatnonzero(~np.isnan(values[start : complete + 1]))
+    state["posted"][key] = complete
+    integral.update(slots / 60, values[slots])
+    return slots
+
+
+def _changed(state: dict, key: str, value: float):
+    # running integrals are posted only when they moved since the last tick
+    kpis = state.setdefault("kpis", dict())
+    if kpis.get(key) == value:
+        return False
+    kpis[key] = value
+    return True
+
+
+def _series(day: date, slots: np.ndarray, values: np.ndarray):
+    return series.MinuteSeries(day, slots, values[slots])
+
+
+def tick(
+    config: schemas.Configuration,
+    state_folder: Path,
+    day: date,
+    locations: list[str] = None,
+    systems: list[str] = None,
+):
+    state = load_state(state_folder, day)
+    readers = state["readers"]
+    api_url = config.api_url
+    # KPIs go through a batch, a results store skips the rows already queued
+    batch = client.Batch(api_url, size=config.http.batch_size)
+
+    meta = metadata.load(config)
+
+    for loc, systems in meta.select(locations, systems):
+
+        irr_colname = config.irr_colname.__getattribute__(loc.loc)
+        usecols = utils.daq_usecols(config, loc.loc, systems)
+
+        daq_filename = config.daq.__getattribute__(loc.loc)
+        daq_filepath = utils.daq_filepath(
+            config.local_folder, loc.loc, daq_filename, day
+        )
+        daq_names = config.daq_colnames.__getattribute__(loc.loc)
+        daq = readers.setdefault(
+            str(daq_filepath), TailReader(daq_filepath, daq_names, usecols)
+        )
+        daq.read()
+
+        for sys in systems:
+            sfcr_filepath = utils.sfcr_filepath(
+                config.local_folder, sys.loc, sys.sfcr, sys.mod, day
+            )
+            sfcr = readers.setdefault(
+                str(sfcr_filepath),
+                TailReader(sfcr_filepath, config.sfcr_colnames, ["p_dc", "p_ac"]),
+            )
+            sfcr.read()
+
+            block = np.empty((utils.MINUTES, 5))
+            daq_cols = [irr_colname, f"t_mod_c_{sys.mod}", f"t_mod_s_{sys.mod}"]
+            block[:, :3] = daq.means(daq_cols)
+            block[:, 3:] = sfcr.means(["p_dc", "p_ac"])
+            block = pipeline.filter_block(
+                block, sys.p_m, config.ranges, derivatives=config.derivatives
+            )
+
+            # irradiance is shared by the systems of the location
+            key = f"{loc.loc}/irr"
+            slots = _new_minutes(state, key, block[:, 0], daq.complete)
+            if len(slots):
+                utils.post_irr(_series(day, slots, block[:, 0]), loc.loc, api_url)
+
+            key = f"{sys.sys}/t_mod"
+            slots = _new_minutes(state, key, block[:, 1], daq.complete)
+            if len(slots):
+                utils.post_tmod(_series(day, slots, block[:, 1]), sys.sys, api_url)
+
+            for i, typ in [(2, "dc"), (3, "ac")]:
+                key = f"{sys.sys}/p_{typ}"
+                slots = _new_minutes(state, key, block[:, i], sfcr.complete)
+                if len(slots):
+                    data = _series(day, slots, block[:, i])
+                    utils.post_power(data, sys.sys, typ, api_url)
+
+            # running energies and yields of the day so far, those changed
+            h = state["integrals"][f"{loc.loc}/irr"].total
+            e_dc = state["integrals"][f"{sys.sys}/p_dc"].total
+            e_ac = state["integrals"][f"{sys.sys}/p_ac"].total
+            if _changed(state, f"{sys.sys}/e_dc", e_dc):
+                utils.post_energy(sys.sys, "dc", day, e_dc, api_url, batch)
+                utils.post_yield(sys.sys, "a", day, e_dc, sys.p_m, api_url, batch)
+            if _changed(state, f"{sys.sys}/e_ac", e_ac):
+                utils.post_energy(sys.sys, "ac", day, e_ac, api_url, batch)
+                utils.post_yield(sys.sys, "f", day, e_ac, sys.p_m, api_url, batch)
+            if _changed(state, f"{sys.sys}/h", h):
+                utils.post_yield(sys.sys, "r", day, h, 1000, api_url, batch)
+
+    batch.flush()
+    client.get_client().wait()
+    save_state(state_folder, day, state)
+
+
+def run(
+    config: schemas.Configuration,
+    state_folder: Path,
+    day: date,
+    locations: list[str] = None,
+    systems: list[str] = None,
+):
+    # a tick with its own client, closed with the results store at the end
+    http = client.from_config(config)
+    try:
+        client.replay_outbox(http)
+        tick(config, state_folder, day, locations, systems)
+    finally:
+        http.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Process and post only the data appended since the last run"
+    )
+    parser.add_argument("--state", type=Path, required=True)
+    parser.add_argument("--day", type=date.fromisoformat, default=date.today())
+    parser.add_argument(
+        "--config", type=Path, default=Path(__file__).parent.parent / "config.json"
+    )
+    args = parser.parse_args()
+
+    config = schemas.Configuration(**json.load(open(args.config)))
+    run(config, args.state, args.day)
+
+
+if __name__ == "__main__":
+    main()
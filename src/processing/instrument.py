@@ -0,0 +1,227 @@
+import contextvars
+import cProfile
+import json
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# per stage timings of a run, off unless configured. Stages are labelled by
+# (loc, sys, day) and written as JSON lines, one event per stage or HTTP
+# request and a summary once the run closes. While off, `stage` returns a
+# shared no-op object and `add` returns at once.
+
+# stage open in the current thread / task, counts of `add` go there
+_current = contextvars.ContextVar("stage", default=None)
+
+
+class Recorder:
+    """Writes stage and request events, aggregated into a summary on close.
+
+    `profile` dumps cProfile stats of the whole run to that path and
+    `memory` traces the peak Python memory of every stage with tracemalloc.
+    """
+
+    def __init__(self, path: Path = None, profile: Path = None, memory=False):
+        self.run = datetime.now().isoformat(timespec="seconds")
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.file = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.file = open(path, "a")
+
+        self.stages = defaultdict(lambda: defaultdict(int))
+        self.latencies = list()
+        self.http = defaultdict(int)
+
+        self.profile = profile
+        self.profiler = None
+        if profile is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        self.memory = memory
+        if memory:
+            tracemalloc.start()
+
+    def write(self, event: dict):
+        if self.file is None:
+            return
+        line = json.dumps(dict(run=self.run, **event), default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def stage(self, name: str, labels: dict, seconds: float, counts: dict):
+        with self.lock:
+            totals = self.stages[name]
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            for key, value in counts.items():
+                if key == "peak_memory":
+                    totals[key] = max(totals[key], value)
+                else:
+                    totals[key] += value
+        self.write(dict(event="stage", stage=name, **labels, seconds=seconds, **counts))
+
+    def request(self, url: str, seconds: float, **fields):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.http["requests"] += 1
+            self.http["bytes"] += fields.get("bytes", 0)
+            self.http["retries"] += fields.get("retries", 0)
+            self.http["failures"] += fields.get("status") != 200
+        self.write(dict(event="http", url=url, seconds=seconds, **fields))
+
+    def summary(self) -> dict:
+        latencies = np.array(self.latencies)
+        http = dict(self.http)
+        if len(latencies):
+            http.update(
+                seconds=latencies.sum(),
+                p50=np.percentile(latencies, 50),
+                p95=np.percentile(latencies, 95),
+                max=latencies.max(),
+            )
+        return dict(
+            event="summary",
+            seconds=time.perf_counter() - self.start,
+            stages={name: dict(totals) for name, totals in self.stages.items()},
+            http=http,
+        )
+
+    def close(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile)
+        summary = self.summary()
+        if self.memory:
+            summary["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.write(summary)
+        if self.file is not None:
+            self.file.close()
+        return summary
+
+
+class Stage:
+    """Times a block of a run; `set` and `add` attach counts to it."""
+
+    __slots__ = ("recorder", "name", "labels", "counts", "start", "token", "traced")
+
+    def __init__(self, recorder: Recorder, name: str, labels: dict):
+        self.recorder = recorder
+        self.name = name
+        self.labels = labels
+        self.counts = dict()
+
+    def __enter__(self):
+        self.token = _current.set(self)
+        if self.recorder.memory:
+            tracemalloc.reset_peak()
+            self.traced = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _current.reset(self.token)
+        if self.recorder.memory:
+            # growth above the memory in use at the start of the stage,
+            # process wide: stages running in other threads count as well
+            peak = tracemalloc.get_traced_memory()[1] - self.traced
+            self.counts["peak_memory"] = peak
+        self.recorder.stage(self.name, self.labels, seconds, self.counts)
+        return False
+
+    def set(self, **counts):
+        self.counts.update(counts)
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+
+class _Off:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **counts):
+        pass
+
+    def add(self, **counts):
+        pass
+
+
+_off = _Off()
+_recorder = None
+
+
+def configure(path: Path = None, profile: Path = None, memory: bool = False):
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = Recorder(path, profile, memory)
+    return _recorder
+
+
+def close():
+    # summary of the run, None when nothing was recorded
+    global _recorder
+    if _recorder is None:
+        return None
+    recorder, _recorder = _recorder, None
+    return recorder.close()
+
+
+def active() -> Recorder:
+    return _recorder
+
+
+def stage(name: str, **labels):
+    if _recorder is None:
+        return _off
+    return Stage(_recorder, name, labels)
+
+
+def add(**counts):
+    # counts of the stage open in the caller, e.g. bytes read by read_file
+    if _recorder is None:
+        return
+    current = _current.get()
+    if current is not None:
+        current.add(**counts)
+
+
+def show(summary: dict):
+    print(f"run {summary['seconds']:.2f} s")
+    for name, totals in summary["stages"].items():
+        counts = ", ".join(
+            f"{key} {value:.0f}"
+            for key, value in totals.items()
+            if key not in ["count", "seconds", "max_seconds"]
+        )
+        print(
+            f"{name:>10} {totals['count']:5.0f} x {totals['seconds']:8.3f} s"
+            f" (max {totals['max_seconds']:.3f} s) {counts}"
+        )
+    http = summary["http"]
+    if http.get("requests"):
+        print(
+            f"{'http':>10} {http['requests']:5d} x {http['seconds']:8.3f} s"
+            f" (p50 {http['p50']:.3f} s, p95 {http['p95']:.3f} s,"
+            f" max {http['max']:.3f} s) retries {http['retries']},"
+            f" failures {http['failures']}, bytes {http['bytes']}"
+        )
+    if "peak_memory" in summary:
+        print(f"peak memory {summary['peak_memory'] / 2**20:.1f} MiB")
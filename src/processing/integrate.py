@@ -0,0 +1,70 @@
+import numpy as np
+from scipy.integrate import trapezoid
+
+
+class Trapezoid:
+    """Running trapezoid integral of samples arriving in time order.
+
+    The last sample is kept so the next update integrates across the seam,
+    giving the same result as one `trapezoid` call over the whole series.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self.last = None
+
+    def update(self, x: np.ndarray, y: np.ndarray):
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        mask = ~np.isnan(y)
+        x, y = x[mask], y[mask]
+        if len(x) == 0:
+            return self.total
+
+        if self.last is not None:
+            x = np.concatenate([[self.last[0]], x])
+            y = np.concatenate([[self.last[1]], y])
+        self.total += trapezoid(y=y, x=x)
+        self.last = (x[-1], y[-1])
+        return self.total
+
+
+class Integrator:
+    """Daily energies of irr, p_dc and p_ac in one pass over datetime64 arrays.
+
+    Each series is integrated over its own samples (h, e_dc, e_ac) and over
+    the minutes where irr and p_ac are both present (h_sync, e_dc_sync,
+    e_ac_sync). `update` can be called again with later samples.
+    """
+
+    def __init__(self):
+        self.full = [Trapezoid() for _ in range(3)]
+        self.sync = [Trapezoid() for _ in range(3)]
+        self.n_sync = 0
+
+    def update(self, dt: np.ndarray, irr, p_dc, p_ac):
+        dt = np.asarray(dt, dtype="datetime64[ns]")
+        # hours of the day, as utils.energy
+        hours = (dt - dt.astype("datetime64[D]")) / np.timedelta64(1, "h")
+        values = [np.asarray(val, dtype=float) for val in (irr, p_dc, p_ac)]
+
+        sync = ~np.isnan(values[0]) & ~np.isnan(values[2])
+        self.n_sync += sync.sum()
+        for full, synced, val in zip(self.full, self.sync, values):
+            full.update(hours, val)
+            synced.update(hours[sync], val[sync])
+        return self
+
+    def params(self):
+        h, e_dc, e_ac = (trapz.total for trapz in self.full)
+        if self.n_sync:
+            h_sync, e_dc_sync, e_ac_sync = (round(t.total, 4) for t in self.sync)
+        else:
+            h_sync = e_dc_sync = e_ac_sync = None
+        return dict(
+            h=h,
+            e_dc=e_dc,
+            e_ac=e_ac,
+            h_sync=h_sync,
+            e_dc_sync=e_dc_sync,
+            e_ac_sync=e_ac_sync,
+        )
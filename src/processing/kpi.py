@@ -0,0 +1,102 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ENERGIES = [("h", "irr"), ("e_dc", "p_dc"), ("e_ac", "p_ac")]
+COLUMNS = ["day", "h", "e_dc", "e_ac", "h_sync", "e_dc_sync", "e_ac_sync"]
+
+
+def _trapezoids(x: np.ndarray, y: np.ndarray, codes: np.ndarray, n: int):
+    # trapezoid integral of every group, rows sorted by group and x
+    valid = ~np.isnan(y)
+    x, y, codes = x[valid], y[valid], codes[valid]
+    same = codes[1:] == codes[:-1]
+    areas = 0.5 * (y[1:] + y[:-1]) * np.diff(x)
+    return np.bincount(codes[1:][same], weights=areas[same], minlength=n)
+
+
+def daily_integrals(df: pd.DataFrame, by: str = None, days: list[date] = None):
+    """Daily energies of a multi day frame with dt, irr, p_dc and p_ac columns.
+
+    Same values as `pipeline.day_params` for every day, and for every value
+    of the `by` column if given. With `days`, days without rows are included
+    with zero energies.
+    """
+    dt = np.asarray(df["dt"], dtype="datetime64[ns]")
+    day = dt.astype("datetime64[D]")
+    hours = (dt - day) / np.timedelta64(1, "h")
+
+    keys = pd.DataFrame(dict(day=day))
+    if by is not None:
+        keys.insert(0, by, df[by].to_numpy())
+    grouped = keys.groupby(list(keys.columns), sort=True)
+    codes = grouped.ngroup().to_numpy()
+    index = grouped.size().index
+    n = len(index)
+
+    order = np.lexsort((hours, codes))
+    hours, codes = hours[order], codes[order]
+    values = {col: df[col].to_numpy(dtype=float)[order] for _, col in ENERGIES}
+
+    sync = ~np.isnan(values["irr"]) & ~np.isnan(values["p_ac"])
+    n_sync = np.bincount(codes[sync], minlength=n)
+
+    out = dict()
+    for name, col in ENERGIES:
+        out[name] = _trapezoids(hours, values[col], codes, n)
+    for name, col in ENERGIES:
+        val = np.where(sync, values[col], np.nan)
+        energy = _trapezoids(hours, val, codes, n).round(4)
+        out[f"{name}_sync"] = np.where(n_sync > 0, energy, np.nan)
+
+    result = pd.DataFrame(out, index=index)
+    if days is not None:
+        days = pd.to_datetime(pd.Index(days)).rename("day")
+        if by is None:
+            full = days
+        else:
+            groups = result.index.get_level_values(by).unique()
+            full = pd.MultiIndex.from_product([groups, days], names=[by, "day"])
+        result = result.reindex(full)
+        result[["h", "e_dc", "e_ac"]] = result[["h", "e_dc", "e_ac"]].fillna(0.0)
+
+    result = result.reset_index()
+    result["day"] = pd.to_datetime(result["day"]).dt.date
+    return result
+
+
+def _per_row(daily: pd.DataFrame, value, by: str):
+    # scalar, or one value per system given as a dict keyed by the by column
+    if isinstance(value, dict):
+        return daily[by].map(value)
+    return value
+
+
+def indicators(daily: pd.DataFrame, p_m, area=None, by: str = None):
+    """Yields, efficiencies and performance ratio of the daily energies.
+
+    `p_m` and `area` are scalars or dicts with a value per system.
+    """
+    df = daily.copy()
+    p_m = _per_row(df, p_m, by)
+
+    df["y_r"] = df["h"] / 1000
+    df["y_a"] = df["e_dc"] / p_m
+    df["y_f"] = df["e_ac"] / p_m
+
+    # efficiency and performance ratio only use the synchronized minutes
+    df["y_r_sync"] = df["h_sync"] / 1000
+    df["y_a_sync"] = df["e_dc_sync"] / p_m
+    df["y_f_sync"] = df["e_ac_sync"] / p_m
+    df["pr"] = df["y_f_sync"] / df["y_r_sync"]
+    if area is not None:
+        h_area = df["h_sync"] * _per_row(df, area, by)
+        df["eff_dc"] = df["e_dc_sync"] / h_area
+        df["eff_ac"] = df["e_ac_sync"] / h_area
+
+    return df.replace([np.inf, -np.inf], np.nan)
+
+
+def kpis(df: pd.DataFrame, p_m, area=None, by: str = None, days=None):
+    return indicators(daily_integrals(df, by, days), p_m, area, by)
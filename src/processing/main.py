@@ -1,153 +1,126 @@
 import json
-import requests
 from datetime import date
-import pandas as pd
 from pathlib import Path
 
-import schemas, utils, filters
+from . import client, instrument, metadata, pipeline, quality, schemas, utils
 
 filepath_config = Path(__file__).parent.parent / "config.json"
 
-config = json.load(open(filepath_config))
-config = schemas.Configuration(**config)
 
-locations = requests.get(f"{config.api_url}/locations/").json()
-locations = [schemas.Location(**dct) for dct in locations]
-modules = requests.get(f"{config.api_url}/modules/").json()
-modules = [schemas.Module(**dct) for dct in modules]
-systems = requests.get(f"{config.api_url}/systems/").json()
-systems = [schemas.System(**dct) for dct in systems]
+def load_config(filepath: Path = filepath_config) -> schemas.Configuration:
+    return schemas.Configuration(**json.load(open(filepath)))
+
+
+def run_days(
+    config: schemas.Configuration,
+    days: list[date],
+    locations: list[str] = None,
+    systems: list[str] = None,
+    meta: metadata.Metadata = None,
+):
+    # process and post every day of the range, see run. The client and the
+    # batch span the whole range, KPI rows of every day go out together
+
+    # uploads are sent in the background and awaited once every day is submitted
+    http = client.from_config(config)
+    client.replay_outbox(http)
+    # daily KPIs of every system and day are collected and sent as column lists
+    batch = client.Batch(config.api_url, size=config.http.batch_size)
+
+    # locations, modules and systems, from the local snapshot while it is fresh
+    meta = meta or metadata.load(config)
+
+    for day in days:
+        print(day)
+        run(config, day, locations, systems, meta, batch)
+
+    # requests run in the background, this is where the range waits for them
+    with instrument.stage("wait"):
+        batch.flush()
+        http.close()
+
+
+def run(
+    config: schemas.Configuration,
+    day: date,
+    locations: list[str] = None,
+    systems: list[str] = None,
+    meta: metadata.Metadata = None,
+    batch: client.Batch = None,
+):
+    # process and post a day of every system, or only of the given
+    # locations / system ids. Without a batch the day is a run of its own,
+    # with one the client and the batch belong to the caller, as in run_days
+    if batch is None:
+        return run_days(config, [day], locations, systems, meta)
+
+    meta = meta or metadata.load(config)
+    # data quality of every series, collected while filtering
+    report = quality.Report()
+
+    for loc, loc_systems in meta.select(locations, systems):
+        print(loc.loc)
+
+        # DAQ file is shared by every system of the location
+        with instrument.stage("read", loc=loc.loc, day=day):
+            df_daq = utils.read_daq(config, day, loc.loc, loc_systems)
+        irr_colname = config.irr_colname.__getattribute__(loc.loc)
+        # print(f"daq {loc.loc} length: ", df_daq.__len__())
 
-day = date.today()
+        irr_posted = False
 
-for loc in locations:
-    print(loc.loc)
-    systems = utils.get_systems(config.api_url, loc.loc)
+        for sys in loc_systems:
+            print(sys.sys)
+            labels = dict(loc=loc.loc, sys=sys.sys, day=day)
 
-    for sys in systems:
-        print(sys.sys)
+            sfcr_filepath = utils.sfcr_filepath(
+                config.local_folder, sys.loc, sys.sfcr, sys.mod, day
+            )
+            # print(f"sfcr {sys.sys} file exists: ", filepath.exists())
+
+            sfcr_names = config.sfcr_colnames
+            usecols = ["p_dc", "p_ac"]
+            with instrument.stage("read", **labels):
+                df_sfcr = utils.read_file(
+                    sfcr_filepath, sfcr_names, day, sys.loc, usecols
+                )
+            # print(f"sfcr {sys.sys} length: ", df_daq.__len__())
+
+            block = pipeline.system_block(
+                df_daq,
+                df_sfcr,
+                irr_colname,
+                sys.mod,
+                sys.p_m,
+                day,
+                config.ranges,
+                report,
+                config.derivatives,
+                loc=loc.loc,
+                sys=sys.sys,
+            )
 
-        daq_filename = config.daq.__getattribute__(loc.loc)
-        daq_filepath = utils.daq_filepath(
-            config.local_folder, loc.loc, daq_filename, day
-        )
-        # print(f"daq {loc.loc} file exists: ", filepath.exists())
+            with instrument.stage("integrate", **labels):
+                params = pipeline.block_params(block, day)
 
-        daq_names = config.daq_colnames.__getattribute__(loc.loc)
-        df_daq = utils.read_file(daq_filepath, daq_names, day)
-        # print(f"daq {loc.loc} length: ", df_daq.__len__())
+            # POST results
+            with instrument.stage("upload", **labels):
+                variables = pipeline.block_series(block, day)
 
-        irr_colname = config.irr_colname.__getattribute__(loc.loc)
-        df_irr = utils.get_variable(df_daq, irr_colname)
-
-        sfcr_filepath = utils.sfcr_filepath(
-            config.local_folder, sys.loc, sys.sfcr, sys.mod, day
-        )
-        # print(f"sfcr {sys.sys} file exists: ", filepath.exists())
-
-        sfcr_names = config.sfcr_colnames
-        df_sfcr = utils.read_file(sfcr_filepath, sfcr_names, day)
-        # print(f"sfcr {sys.sys} length: ", df_daq.__len__())
-
-        df_tmod_c = utils.get_variable(df_daq, f"t_mod_c_{sys.mod}")
-        df_tmod_s = utils.get_variable(df_daq, f"t_mod_s_{sys.mod}")
-        df_p_dc = utils.get_variable(df_sfcr, "p_dc")
-        df_p_ac = utils.get_variable(df_sfcr, "p_ac")
-
-        df_irr.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_tmod_c.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_tmod_s.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_p_dc.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_p_ac.sort_values(by="dt", inplace=True, ignore_index=True)
-
-        df_irr = filters.irradiance(df_irr["dt"], df_irr["val"], day)
-        df_tmod = filters.module_temperatures(
-            df_tmod_c["dt"],
-            df_tmod_c[f"val"],
-            df_tmod_s["dt"],
-            df_tmod_s[f"val"],
-            day,
-        )
-        df_p_dc = filters.power(df_p_dc["dt"], df_p_dc["val"], sys.p_m, day)
-        df_p_ac = filters.power(df_p_ac["dt"], df_p_ac["val"], sys.p_m, day)
-
-        df_irr.dropna(inplace=True)
-        df_tmod.dropna(inplace=True)
-        df_p_dc.dropna(inplace=True)
-        df_p_ac.dropna(inplace=True)
-
-        df_irr.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_tmod.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_p_dc.sort_values(by="dt", inplace=True, ignore_index=True)
-        df_p_ac.sort_values(by="dt", inplace=True, ignore_index=True)
-
-        if filters.corroborate_measurement(df_irr["dt"].tolist(), day):
-            df_irr = pd.DataFrame(columns=["dt", "val"])
-        if filters.corroborate_measurement(df_tmod["dt"].tolist(), day):
-            df_tmod = pd.DataFrame(columns=["dt", "val"])
-        if filters.corroborate_measurement(df_p_dc["dt"].tolist(), day):
-            df_p_dc = pd.DataFrame(columns=["dt", "val"])
-        if filters.corroborate_measurement(df_p_ac["dt"].tolist(), day):
-            df_p_ac = pd.DataFrame(columns=["dt", "val"])
-
-        df_joined = pd.DataFrame(columns=["dt"])
-        df = df_irr[["dt", "val"]].copy().rename(columns={"val": "irr"})
-        df_joined = pd.merge(df_joined, df, on="dt", how="outer")
-        df = df_tmod[["dt", "val"]].copy().rename(columns={"val": "t_mod"})
-        df_joined = pd.merge(df_joined, df, on="dt", how="outer")
-        df = df_p_dc[["dt", "val"]].copy().rename(columns={"val": "p_dc"})
-        df_joined = pd.merge(df_joined, df, on="dt", how="outer")
-        df = df_p_ac[["dt", "val"]].copy().rename(columns={"val": "p_ac"})
-        df_joined = pd.merge(df_joined, df, on="dt", how="outer")
-
-        df_joined["dt"] = pd.DataFrame(df_joined["dt"])
-
-        try:
-            df_joined["dt_hour"] = (
-                df_joined["dt"].dt.hour
-                + (df_joined["dt"].dt.minute / 60)
-                + (df_joined["dt"].dt.second / 3600)
-            )
-        except AttributeError:
-            df_joined["dt_hour"] = None
-
-        number_cols = df_joined.select_dtypes(include="number").columns.tolist()
-        df_joined.dropna(inplace=True, subset=number_cols, how="all")
-        df_joined.sort_values(by="dt", inplace=True, ignore_index=True)
-
-        # POST results
-        utils.post_irr(df_irr, sys.loc, config.api_url)
-        utils.post_tmod(df_tmod, sys.sys, config.api_url)
-        utils.post_power(df_p_dc, sys.sys, "dc", config.api_url)
-        utils.post_power(df_p_dc, sys.sys, "ac", config.api_url)
-
-        h = utils.energy(df_irr["dt"], df_irr["val"])
-        e_dc = utils.energy(df_p_dc["dt"], df_p_dc["val"])
-        e_ac = utils.energy(df_p_ac["dt"], df_p_ac["val"])
-
-        utils.post_energy(sys.sys, "dc", day, e_dc, config.api_url)
-        utils.post_energy(sys.sys, "ac", day, e_ac, config.api_url)
-
-        utils.post_yield(sys.sys, "r", day, h, 1000, config.api_url)
-        utils.post_yield(sys.sys, "a", day, e_dc, sys.p_m, config.api_url)
-        utils.post_yield(sys.sys, "f", day, e_ac, sys.p_m, config.api_url)
-
-        params = utils.get_params(df_joined, subset=["irr", "p_ac"])
-        utils.post_efficiency(
-            sys.sys,
-            day,
-            params["e_dc"],
-            params["e_ac"],
-            params["h"],
-            sys.area,
-            config.api_url,
-        )
-        utils.post_performance_ratio(
-            sys.sys,
-            day,
-            params["h"],
-            params["e_dc"],
-            params["e_ac"],
-            sys.p_m,
-            config.api_url,
-        )
+                if not irr_posted:
+                    # irradiance is the same for every system of the location
+                    utils.post_irr(variables["irr"], loc.loc, config.api_url)
+                    irr_posted = True
+
+                utils.post_system(sys, day, variables, params, config.api_url, batch)
+
+    if config.quality_folder is not None:
+        report.write(config.quality_folder / f"{day}.parquet")
+
+
+def main():
+    run(load_config(), date.today())
+
+
+if __name__ == "__main__":
+    main()
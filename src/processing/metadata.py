@@ -0,0 +1,131 @@
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from . import schemas
+
+# metadata endpoints and their schema
+ENDPOINTS = dict(
+    locations=schemas.Location, modules=schemas.Module, systems=schemas.System
+)
+
+
+class Metadata:
+    """Locations, modules and systems of the API, systems indexed by location."""
+
+    def __init__(self, data: dict[str, list[dict]], fetched: float = None):
+        self.fetched = fetched
+        self.locations = [schemas.Location(**dct) for dct in data["locations"]]
+        self.modules = [schemas.Module(**dct) for dct in data["modules"]]
+        self.systems = [schemas.System(**dct) for dct in data["systems"]]
+
+        self.by_location = defaultdict(list)
+        for sys in self.systems:
+            self.by_location[sys.loc].append(sys)
+
+    def location_systems(self, loc: str) -> list[schemas.System]:
+        return self.by_location.get(loc, [])
+
+    def select(self, locations: list[str] = None, systems: list[str] = None):
+        # (location, systems) pairs, only the given locations / system ids if set
+        selected = list()
+        for loc in self.locations:
+            if locations and loc.loc not in locations:
+                continue
+            loc_systems = [
+                sys
+                for sys in self.location_systems(loc.loc)
+                if not systems or sys.sys in systems
+            ]
+            if loc_systems:
+                selected.append((loc, loc_systems))
+        return selected
+
+
+def snapshot_path(config: schemas.Configuration) -> Path:
+    return config.metadata.path or Path(config.local_folder) / "metadata.json"
+
+
+def _read_snapshot(path: Path, api_url: str):
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if snapshot.get("api_url") != api_url:
+        return None
+    return snapshot
+
+
+def _write_snapshot(path: Path, snapshot: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    tmp.replace(path)
+
+
+def _fetch(url: str, entry: dict, timeout: float):
+    # revalidated with the validators of the snapshot, 304 keeps its data
+    headers = dict()
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and entry is not None:
+        return entry
+    response.raise_for_status()
+    return dict(
+        data=response.json(),
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+
+
+def _metadata(snapshot: dict) -> Metadata:
+    data = {name: entry["data"] for name, entry in snapshot["endpoints"].items()}
+    return Metadata(data, snapshot["fetched"])
+
+
+def load(config: schemas.Configuration) -> Metadata:
+    # snapshot younger than the ttl: no request at all
+    settings = config.metadata
+    path = snapshot_path(config)
+    snapshot = _read_snapshot(path, config.api_url)
+    if snapshot is not None and time.time() - snapshot["fetched"] < settings.ttl:
+        return _metadata(snapshot)
+
+    entries = snapshot["endpoints"] if snapshot is not None else dict()
+    with ThreadPoolExecutor(max_workers=len(ENDPOINTS)) as executor:
+        futures = {
+            name: executor.submit(
+                _fetch,
+                f"{config.api_url}/{name}/",
+                entries.get(name),
+                settings.timeout,
+            )
+            for name in ENDPOINTS
+        }
+
+    try:
+        entries = {name: future.result() for name, future in futures.items()}
+    except requests.RequestException as e:
+        # slow or unreachable API, the last snapshot is used however old
+        if snapshot is None:
+            raise
+        print(f"Metadata request failed, using the snapshot: {e}")
+        return _metadata(snapshot)
+
+    snapshot = dict(api_url=config.api_url, fetched=time.time(), endpoints=entries)
+    try:
+        _write_snapshot(path, snapshot)
+    except OSError as e:
+        print(f"Metadata snapshot not saved: {e}")
+    return _metadata(snapshot)
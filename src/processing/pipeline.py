@@ -0,0 +1,153 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from . import filters, instrument, integrate, quality, schemas, series, utils
+
+VARIABLES = ["irr", "t_mod", "p_dc", "p_ac"]
+
+
+def minute_block(df: pd.DataFrame, columns: list[str]):
+    # per minute mean of each column scattered into a (1440, columns) block,
+    # missing columns and empty minutes are nan, and the samples per minute
+    values = np.full((len(df), len(columns)), np.nan)
+    for i, col in enumerate(columns):
+        if col in df:
+            values[:, i] = df[col].to_numpy(dtype=float)
+
+    sums = np.zeros((utils.MINUTES, len(columns)))
+    counts = np.zeros((utils.MINUTES, len(columns)), dtype=np.int64)
+    if not df.empty:
+        utils.fold_minutes(utils.minute_slots(df["dt"]), values, sums, counts)
+
+    with np.errstate(invalid="ignore"):
+        return sums / counts, counts
+
+
+def minute_frame(block: np.ndarray, columns: list[str], day: date):
+    # rows of the block with at least one value, on the daily minute index
+    slots = np.flatnonzero(~np.isnan(block).all(axis=1))
+    df = pd.DataFrame(block[slots], columns=columns)
+    df.insert(0, "dt", pd.Timestamp(day) + pd.to_timedelta(slots, unit="min"))
+    df["dt_hour"] = slots / 60
+    return df
+
+
+def filter_block(
+    block: np.ndarray,
+    p_m: float,
+    ranges: schemas.Ranges = schemas.Ranges(),
+    rules: np.ndarray = None,
+    derivatives: schemas.Derivatives = schemas.Derivatives(),
+):
+    # range and derivative rules on irr, t_mod_c, t_mod_s, p_dc, p_ac columns,
+    # returns irr, t_mod, p_dc, p_ac with both module temperature sensors
+    # averaged. rules, if given, is set to the rule hit by every value
+    limits = [
+        ranges.irr,
+        ranges.t_mod,
+        ranges.t_mod,
+        schemas.Range(lower=ranges.p.lower * p_m, upper=ranges.p.upper * p_m),
+        schemas.Range(lower=ranges.p.lower * p_m, upper=ranges.p.upper * p_m),
+    ]
+    power = derivatives.p.dict()
+    if power["abrupt"] is not None:
+        power["abrupt"] *= p_m
+    irr, t_mod = derivatives.irr.dict(), derivatives.t_mod.dict()
+    settings = [irr, t_mod, t_mod, power, power]
+    seconds = np.arange(utils.MINUTES) * 60.0
+
+    for i, (limit, setting) in enumerate(zip(limits, settings)):
+        col = block[:, i]
+        with np.errstate(invalid="ignore"):
+            below, above = col < limit.lower, limit.upper < col
+        col[below | above] = np.nan
+        if rules is not None:
+            rules[:, i] = above.astype(np.int8) - below
+
+        # derivatives between the minutes left by the range rule
+        if any(value is not None for value in setting.values()):
+            hits = filters.derivative_rules(seconds, col, **setting)
+            col[hits != 0] = np.nan
+            if rules is not None:
+                rules[hits != 0, i] = hits[hits != 0]
+    block = block.round(4)
+
+    counts = (~np.isnan(block[:, 1:3])).sum(axis=1)
+    with np.errstate(invalid="ignore"):
+        t_mod = np.nansum(block[:, 1:3], axis=1) / counts
+    return np.column_stack([block[:, 0], t_mod.round(4), block[:, 3], block[:, 4]])
+
+
+def system_block(
+    df_daq: pd.DataFrame,
+    df_sfcr: pd.DataFrame,
+    irr_colname: str,
+    mod: str,
+    p_m: float,
+    day: date,
+    ranges: schemas.Ranges = schemas.Ranges(),
+    report: quality.Report = None,
+    derivatives: schemas.Derivatives = schemas.Derivatives(),
+    **labels,
+):
+    # irr, t_mod_c, t_mod_s, p_dc, p_ac aligned on the minutes of the day
+    with instrument.stage("join", day=day, **labels) as stage:
+        block = np.empty((utils.MINUTES, 5))
+        counts = np.empty((utils.MINUTES, 5), dtype=np.int64)
+        daq_cols = [irr_colname, f"t_mod_c_{mod}", f"t_mod_s_{mod}"]
+        block[:, :3], counts[:, :3] = minute_block(df_daq, daq_cols)
+        block[:, 3:], counts[:, 3:] = minute_block(df_sfcr, ["p_dc", "p_ac"])
+        stage.set(rows_in=len(df_daq) + len(df_sfcr), rows_out=utils.MINUTES)
+
+    with instrument.stage("filter", day=day, **labels) as stage:
+        rules = np.zeros((utils.MINUTES, 5), dtype=np.int8)
+        block = filter_block(block, p_m, ranges, rules, derivatives)
+
+        # variables failing the daily quality checks are discarded
+        reject = quality.corroborate_minutes(~np.isnan(block))
+        block[:, reject] = np.nan
+        if instrument.active() is not None:
+            # minutes with any value before and after
+            rows_in = counts.any(axis=1).sum()
+            rows_out = (~np.isnan(block)).any(axis=1).sum()
+            stage.set(rows_in=int(rows_in), rows_out=int(rows_out))
+
+    if report is not None:
+        # both module temperature sensors share the check of t_mod
+        report.add(day, counts, rules, reject[[0, 1, 1, 2, 3]], **labels)
+
+    return block
+
+
+def system_day(df_daq, df_sfcr, irr_colname, mod, p_m, day, *args, **kwargs):
+    # filtered variables joined on the minutes of the day, see system_block
+    block = system_block(df_daq, df_sfcr, irr_colname, mod, p_m, day, *args, **kwargs)
+    return minute_frame(block, VARIABLES, day)
+
+
+def block_series(block: np.ndarray, day: date):
+    # MinuteSeries of every variable of a system_block
+    return {
+        var: series.MinuteSeries.from_array(day, block[:, i])
+        for i, var in enumerate(VARIABLES)
+    }
+
+
+def day_params(df_joined: pd.DataFrame, day: date):
+    # daily energies of every variable and of the minutes where irr and p_ac meet
+    integrator = integrate.Integrator().update(
+        df_joined["dt"], df_joined["irr"], df_joined["p_dc"], df_joined["p_ac"]
+    )
+    return dict(day=day, **integrator.params())
+
+
+def block_params(block: np.ndarray, day: date):
+    # day_params of a system_block, without building the joined frame
+    minute = np.timedelta64(1, "m")
+    minutes = np.datetime64(day, "ns") + np.arange(utils.MINUTES) * minute
+    integrator = integrate.Integrator().update(
+        minutes, block[:, 0], block[:, 2], block[:, 3]
+    )
+    return dict(day=day, **integrator.params())
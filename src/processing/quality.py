@@ -0,0 +1,201 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from . import filters, utils
+
+# a series is kept for a day when it has values before 10:30 and after 13:30
+# and covers at least 80 % of the minutes between its first and last value,
+# as filters.corroborate_measurement
+MORNING = 10 * 60 + 30
+AFTERNOON = 13 * 60 + 30
+COVERAGE = 0.8
+
+
+def corroborate_minutes(valid: np.ndarray):
+    """Days to discard, from minute grids of valid values.
+
+    `valid` has the minutes of the day on the second to last axis, e.g.
+    (1440, series) or (days, 1440, series); the result drops that axis and is
+    True where the series fails the checks for the day.
+    """
+    valid = np.asarray(valid, dtype=bool)
+    morning = valid[..., :MORNING, :].any(axis=-2)
+    afternoon = valid[..., AFTERNOON + 1 :, :].any(axis=-2)
+
+    counts = valid.sum(axis=-2)
+    first = valid.argmax(axis=-2)
+    last = utils.MINUTES - 1 - valid[..., ::-1, :].argmax(axis=-2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coverage = counts / (last - first + 1)
+
+    return ~morning | ~afternoon | (coverage < COVERAGE)
+
+
+def corroborate(dt, series=None):
+    """Days to discard, from the timestamps of the valid values.
+
+    Returns a boolean Series indexed by day, or by (series, day) when the
+    series label of every timestamp is given.
+    """
+    dt = np.asarray(dt, dtype="datetime64[ns]")
+    day = dt.astype("datetime64[D]")
+    time_of_day = (dt - day).view("i8")
+
+    keys = pd.DataFrame(dict(day=day))
+    if series is not None:
+        keys.insert(0, "series", np.asarray(series))
+    grouped = keys.groupby(list(keys.columns), sort=True)
+    codes = grouped.ngroup().to_numpy()
+    index = grouped.size().index
+    n = len(index)
+
+    order = np.lexsort((dt, codes))
+    codes, ns, time_of_day = codes[order], dt.view("i8")[order], time_of_day[order]
+
+    minute = utils.MINUTE_NS
+    morning = np.bincount(codes, weights=time_of_day < MORNING * minute, minlength=n)
+    afternoon = np.bincount(
+        codes, weights=time_of_day > AFTERNOON * minute, minlength=n
+    )
+
+    counts = np.bincount(codes, minlength=n)
+    first = np.searchsorted(codes, np.arange(n))
+    span = (ns[first + counts - 1] - ns[first]) / minute + 1
+    coverage = counts / span
+
+    reject = (morning == 0) | (afternoon == 0) | (coverage < COVERAGE)
+    return pd.Series(reject, index=index, name="reject")
+
+
+# raw columns of the pipeline block, both module temperature sensors separately
+SERIES = ["irr", "t_mod_c", "t_mod_s", "p_dc", "p_ac"]
+# gaps between valid minutes longer than this are counted
+GAP = 5
+
+# columns of a report after its labels, and their types
+COLUMNS = dict(
+    day="datetime64[ns]",
+    series="category",
+    samples=np.int32,
+    minutes=np.int16,
+    valid=np.int16,
+    below=np.int16,
+    above=np.int16,
+    dead=np.int16,
+    abrupt=np.int16,
+    stuck=np.int16,
+    gaps=np.int16,
+    longest_gap=np.int16,
+    first="datetime64[ns]",
+    last="datetime64[ns]",
+    rejected=bool,
+)
+
+
+def _gaps(valid: np.ndarray, gap: int):
+    # number of gaps longer than gap and longest gap of every column, in minutes
+    n = valid.shape[1]
+    cols, slots = np.nonzero(valid.T)
+    same = cols[1:] == cols[:-1]
+    missing = (np.diff(slots) - 1)[same]
+    cols = cols[1:][same]
+
+    gaps = np.bincount(cols, weights=missing > gap, minlength=n)
+    longest = np.zeros(n, dtype=np.int64)
+    np.maximum.at(longest, cols, missing)
+    return gaps, longest
+
+
+class Report:
+    """Data quality records of every series and day seen by the pipeline.
+
+    `add` takes the arrays already computed while filtering a day: raw
+    samples per minute, the filters rule hit by every minute and the result
+    of the daily checks. Records are kept as column arrays and only turned
+    into a frame by `frame`.
+    """
+
+    def __init__(self, gap: int = GAP):
+        self.gap = gap
+        self.labels = list()
+        self.columns = defaultdict(list)
+
+    def _check_labels(self, labels: list[str]):
+        # every record has the same labels, the columns would be ragged
+        if self.columns and set(labels) != set(self.labels):
+            raise ValueError(f"labels {sorted(labels)} != {sorted(self.labels)}")
+
+    def add(self, day, counts, rules, reject, **labels):
+        self._check_labels(list(labels))
+        present = counts > 0
+        valid = present & (rules == 0)
+        gaps, longest = _gaps(valid, self.gap)
+
+        # first and last minute with samples, NaT for series without any
+        start = np.datetime64(day, "ns")
+        has = present.any(axis=0)
+        first = present.argmax(axis=0)
+        last = utils.MINUTES - 1 - present[::-1].argmax(axis=0)
+        nat = np.datetime64("NaT", "ns")
+        minute = np.timedelta64(1, "m")
+
+        n = len(SERIES)
+        for key, value in labels.items():
+            if key not in self.labels:
+                self.labels.append(key)
+            self.columns[key].append(np.full(n, value, dtype=object))
+
+        record = dict(
+            day=np.full(n, start),
+            series=np.array(SERIES, dtype=object),
+            samples=counts.sum(axis=0).astype(np.int32),
+            minutes=present.sum(axis=0).astype(np.int16),
+            valid=valid.sum(axis=0).astype(np.int16),
+            below=(rules == filters.BELOW).sum(axis=0).astype(np.int16),
+            above=(rules == filters.ABOVE).sum(axis=0).astype(np.int16),
+            dead=(rules == filters.DEAD).sum(axis=0).astype(np.int16),
+            abrupt=(rules == filters.ABRUPT).sum(axis=0).astype(np.int16),
+            stuck=(rules == filters.STUCK).sum(axis=0).astype(np.int16),
+            gaps=gaps.astype(np.int16),
+            longest_gap=longest.astype(np.int16),
+            first=np.where(has, start + first * minute, nat),
+            last=np.where(has, start + last * minute, nat),
+            rejected=np.asarray(reject, dtype=bool),
+        )
+        for key, value in record.items():
+            self.columns[key].append(value)
+
+    def merge(self, other: "Report"):
+        # records of another report, e.g. one filled in another thread
+        if not other.columns:
+            return
+        self._check_labels(other.labels)
+        for key in other.labels:
+            if key not in self.labels:
+                self.labels.append(key)
+        for key, arrays in other.columns.items():
+            self.columns[key].extend(arrays)
+
+    def frame(self):
+        if not self.columns:
+            # nothing seen, e.g. a day without files
+            columns = {key: "category" for key in self.labels}
+            columns.update(COLUMNS)
+            return pd.DataFrame(
+                {key: pd.Series(dtype=dtype) for key, dtype in columns.items()}
+            )
+        df = pd.DataFrame(
+            {key: np.concatenate(arrays) for key, arrays in self.columns.items()}
+        )
+        for col in [*self.labels, "series"]:
+            if col in df:
+                df[col] = df[col].astype("category")
+        # labels first
+        return df[self.labels + [col for col in df if col not in self.labels]]
+
+    def write(self, path):
+        # parquet keeps the report columnar and small
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.frame().to_parquet(path, index=False)
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from . import schemas, series, utils
+
+# client errors fail the same way however often the request is sent, they
+# stay in the outbox for inspection but are not retried, except these
+RETRIED = (408, 429)
+# runs a request is sent in before it is given up, and kept as rejected
+ATTEMPTS = 5
+
+SCHEMA = """
+create table if not exists series (
+    endpoint text, owner text, type text, day text,
+    minutes blob, vals blob, queued real,
+    primary key (endpoint, owner, type, day)
+);
+create table if not exists kpis (
+    endpoint text, fixed text, day text, hash text, queued real,
+    primary key (endpoint, fixed, day)
+);
+create table if not exists outbox (
+    id integer primary key, url text, body blob, headers text,
+    created real, attempts integer default 0, status integer, error text,
+    rejected integer default 0
+);
+"""
+
+
+def _hash(row: dict) -> str:
+    return hashlib.sha1(
+        json.dumps(row, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class Results:
+    """What was handed to the API, and the requests not delivered yet, in SQLite.
+
+    Series are kept as the minutes and values last queued per (endpoint,
+    owner, type, day) and KPI rows as a hash per (endpoint, sys/type, day),
+    so only new or changed rows are posted again. Every request is written
+    to the outbox in the same transaction and deleted once the API accepts
+    it; whatever is left is sent again by `replay` on a later run, up to
+    `attempts` times.
+    """
+
+    def __init__(self, path: Path, attempts: int = ATTEMPTS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # shared by the client threads, transactions are serialized by the lock
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("pragma journal_mode=wal")
+        self.db.execute("pragma synchronous=normal")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.attempts = attempts
+
+    @contextmanager
+    def transaction(self):
+        # nested transactions join the outer one
+        with self.lock:
+            if self.depth == 0:
+                self.db.execute("begin")
+            self.depth += 1
+            try:
+                yield self.db
+            except BaseException:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.db.execute("rollback")
+                raise
+            self.depth -= 1
+            if self.depth == 0:
+                self.db.execute("commit")
+
+    def _series_values(self, key: tuple):
+        # values of every minute of the day last queued, nan where none
+        row = self.db.execute(
+            "select minutes, vals from series"
+            " where endpoint = ? and owner = ? and type = ? and day = ?",
+            key,
+        ).fetchone()
+        values = np.full(utils.MINUTES, np.nan, dtype=np.float64)
+        if row is not None:
+            minutes = np.frombuffer(row[0], dtype=np.int16)
+            values[minutes] = np.frombuffer(row[1], dtype=np.float64)
+        return values
+
+    def series_delta(self, endpoint: str, owner: str, typ: str, data):
+        # minutes of a MinuteSeries that are new or changed since last queued
+        with self.lock:
+            queued = self._series_values((endpoint, owner, typ, str(data.day)))
+        changed = queued[data.minutes] != data.values
+        return series.MinuteSeries(
+            data.day, data.minutes[changed], data.values[changed]
+        )
+
+    def series_queued(self, endpoint: str, owner: str, typ: str, delta):
+        key = (endpoint, owner, typ, str(delta.day))
+        with self.transaction() as db:
+            values = self._series_values(key)
+            values[delta.minutes] = delta.values
+            minutes = np.flatnonzero(~np.isnan(values)).astype(np.int16)
+            db.execute(
+                "insert or replace into series values (?, ?, ?, ?, ?, ?, ?)",
+                (*key, minutes.tobytes(), values[minutes].tobytes(), time.time()),
+            )
+
+    def kpi_changed(self, endpoint: str, fixed: dict, columns: dict[str, list]):
+        # positions of the rows that are new or changed since the last queued
+        fixed = json.dumps(fixed, sort_keys=True)
+        with self.lock:
+            queued = dict(
+                self.db.execute(
+                    "select day, hash from kpis where endpoint = ? and fixed = ?",
+                    (endpoint, fixed),
+                )
+            )
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        return [
+            i for i, row in enumerate(rows) if queued.get(str(row["day"])) != _hash(row)
+        ]
+
+    def kpi_queued(self, endpoint: str, fixed: dict, columns: dict[str, list]):
+        fixed = json.dumps(fixed, sort_keys=True)
+        now = time.time()
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        with self.transaction() as db:
+            db.executemany(
+                "insert or replace into kpis values (?, ?, ?, ?, ?)",
+                [(endpoint, fixed, str(row["day"]), _hash(row), now) for row in rows],
+            )
+
+    def put(self, url: str, body: bytes, headers: dict) -> int:
+        with self.transaction() as db:
+            cursor = db.execute(
+                "insert into outbox (url, body, headers, created) values (?, ?, ?, ?)",
+                (url, body, json.dumps(headers), time.time()),
+            )
+            return cursor.lastrowid
+
+    def delivered(self, entry: int):
+        with self.transaction() as db:
+            db.execute("delete from outbox where id = ?", (entry,))
+
+    def failed(self, entry: int, status: int = None, error: str = None):
+        rejected = status is not None and 400 <= status < 500
+        rejected = rejected and status not in RETRIED
+        with self.transaction() as db:
+            db.execute(
+                "update outbox set attempts = attempts + 1, status = ?, error = ?,"
+                " rejected = ? or attempts + 1 >= ? where id = ?",
+                (status, error, rejected, self.attempts, entry),
+            )
+
+    def rejected(self, entry: int) -> bool:
+        with self.lock:
+            row = self.db.execute(
+                "select rejected from outbox where id = ?", (entry,)
+            ).fetchone()
+        return row is not None and bool(row[0])
+
+    def pending(self):
+        # (id, url, body, headers) of the requests still to be delivered
+        with self.lock:
+            rows = self.db.execute(
+                "select id, url, body, headers from outbox"
+                " where rejected = 0 order by id"
+            ).fetchall()
+        return [
+            (entry, url, body, json.loads(headers))
+            for entry, url, body, headers in rows
+        ]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def from_config(config: schemas.Configuration):
+    if config.results_path is None:
+        return None
+    return Results(config.results_path)
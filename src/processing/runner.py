@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from . import client, instrument, metadata, pipeline, quality, schemas, utils
+from . import main as serial
+
+# asyncio version of main.py: metadata comes from metadata.load, files are
+# parsed and filtered in a thread pool and the uploads of a system go out
+# while the next systems are still being computed. Posting, the batch and
+# the report are only touched from the event loop.
+
+
+def _read_daq(config: schemas.Configuration, day: date, loc, systems):
+    with instrument.stage("read", loc=loc.loc, day=day):
+        return utils.read_daq(config, day, loc.loc, systems)
+
+
+def _system_block(config: schemas.Configuration, day: date, loc, sys, df_daq):
+    sfcr_filepath = utils.sfcr_filepath(
+        config.local_folder, sys.loc, sys.sfcr, sys.mod, day
+    )
+    usecols = ["p_dc", "p_ac"]
+    with instrument.stage("read", loc=loc.loc, sys=sys.sys, day=day):
+        df_sfcr = utils.read_file(
+            sfcr_filepath, config.sfcr_colnames, day, sys.loc, usecols
+        )
+
+    # reports are filled per thread and merged on the event loop
+    report = quality.Report()
+    block = pipeline.system_block(
+        df_daq,
+        df_sfcr,
+        config.irr_colname.__getattribute__(loc.loc),
+        sys.mod,
+        sys.p_m,
+        day,
+        config.ranges,
+        report,
+        config.derivatives,
+        loc=loc.loc,
+        sys=sys.sys,
+    )
+    with instrument.stage("integrate", loc=loc.loc, sys=sys.sys, day=day):
+        params = pipeline.block_params(block, day)
+    return block, params, report
+
+
+async def _location(config, day, loc, systems, executor, batch, report):
+    loop = asyncio.get_running_loop()
+    df_daq = await loop.run_in_executor(executor, _read_daq, config, day, loc, systems)
+
+    tasks = [
+        loop.run_in_executor(executor, _system_block, config, day, loc, sys, df_daq)
+        for sys in systems
+    ]
+    for i, (sys, task) in enumerate(zip(systems, tasks)):
+        block, params, system_report = await task
+        print(sys.sys)
+        report.merge(system_report)
+
+        with instrument.stage("upload", loc=loc.loc, sys=sys.sys, day=day):
+            variables = pipeline.block_series(block, day)
+            if i == 0:
+                # irradiance is the same for every system of the location
+                utils.post_irr(variables["irr"], loc.loc, config.api_url)
+
+            utils.post_system(sys, day, variables, params, config.api_url, batch)
+
+
+async def run_days(
+    config: schemas.Configuration,
+    days: list[date],
+    workers: int = None,
+    locations: list[str] = None,
+    systems: list[str] = None,
+    meta: metadata.Metadata = None,
+):
+    # every day of the range, see run; as main.run_days, the client and the
+    # batch span the whole range
+    loop = asyncio.get_running_loop()
+    http = client.from_config(config)
+    # the outbox is replayed off the event loop, see client.replay_outbox
+    await loop.run_in_executor(None, client.replay_outbox, http)
+    batch = client.Batch(config.api_url, size=config.http.batch_size)
+
+    # endpoints are fetched concurrently when the snapshot is stale
+    if meta is None:
+        meta = await loop.run_in_executor(None, metadata.load, config)
+
+    for day in days:
+        print(day)
+        await run(config, day, workers, locations, systems, meta, batch)
+
+    with instrument.stage("wait"):
+        batch.flush()
+        await loop.run_in_executor(None, http.close)
+
+
+async def run(
+    config: schemas.Configuration,
+    day: date,
+    workers: int = None,
+    locations: list[str] = None,
+    systems: list[str] = None,
+    meta: metadata.Metadata = None,
+    batch: client.Batch = None,
+):
+    # a day of every system, a run of its own without a batch
+    if batch is None:
+        return await run_days(config, [day], workers, locations, systems, meta)
+
+    loop = asyncio.get_running_loop()
+    if meta is None:
+        meta = await loop.run_in_executor(None, metadata.load, config)
+    report = quality.Report()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        await asyncio.gather(
+            *(
+                _location(config, day, loc, loc_systems, executor, batch, report)
+                for loc, loc_systems in meta.select(locations, systems)
+            )
+        )
+
+    if config.quality_folder is not None:
+        report.write(config.quality_folder / f"{day}.parquet")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Process and post a day of every system concurrently"
+    )
+    parser.add_argument("--day", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--config", type=Path, default=serial.filepath_config)
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        help="also run the serial main.run and compare wall times, "
+        "both runs post to --api-url",
+    )
+    parser.add_argument("--api-url", help="stub of the API, required by --serial")
+    args = parser.parse_args()
+
+    config = serial.load_config(args.config)
+
+    meta = None
+    if args.serial:
+        if args.api_url is None:
+            parser.error("--serial posts the day twice, give a stub with --api-url")
+        # systems of the configured API, the day is only posted to the stub
+        # and nothing is recorded in the results store
+        meta = metadata.load(config)
+        config = config.copy(update=dict(api_url=args.api_url, results_path=None))
+
+        start = time.perf_counter()
+        serial.run(config, args.day, meta=meta)
+        print(f"main.run wall time: {time.perf_counter() - start:.2f} s")
+        # files are parsed again by the runner
+        utils.clear_read_cache()
+
+    start = time.perf_counter()
+    asyncio.run(run(config, args.day, args.workers, meta=meta))
+    print(f"runner wall time: {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
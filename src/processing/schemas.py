@@ -2,6 +2,11 @@ from pydantic import BaseModel
 from datetime import date
 from pathlib import Path
 
+# stations and module technologies, a system is a module at a location
+LOCATIONS = ["pucp", "uni", "untrm", "unaj", "unjbg", "unsa"]
+MODULES = ["perc", "hit", "cigs"]
+NOMINAL_POWERS = dict(perc=1675, hit=1650, cigs=1610)
+
 
 class DaqColnames(BaseModel):
     pucp: list[str]
@@ -30,6 +35,53 @@ class DAQs(BaseModel):
     unsa: str
 
 
+class Http(BaseModel):
+    workers: int = 8
+    retries: int = 3
+    backoff: float = 0.5
+    batch_size: int = 500
+    # gzip request bodies, the API has to accept Content-Encoding: gzip
+    gzip: bool = False
+
+
+class Range(BaseModel):
+    lower: float
+    upper: float
+
+
+class Ranges(BaseModel):
+    irr: Range = Range(lower=20, upper=2000)
+    t_mod: Range = Range(lower=-30, upper=70)
+    # relative to the nominal power of the system
+    p: Range = Range(lower=-0.01, upper=1.05)
+
+
+class Derivative(BaseModel):
+    # rates of change per second, every rule is off unless set
+    dead: float = None
+    dead_lower_limit: float = None
+    abrupt: float = None
+    # identical consecutive readings of a stuck sensor
+    stuck: int = None
+
+
+class Derivatives(BaseModel):
+    irr: Derivative = Derivative()
+    t_mod: Derivative = Derivative()
+    # abrupt relative to the nominal power of the system
+    p: Derivative = Derivative()
+
+
+class MetadataCache(BaseModel):
+    # snapshot of locations, modules and systems, metadata.json in
+    # local_folder when not set
+    path: Path = None
+    # seconds a snapshot is used without asking the API
+    ttl: float = 3600
+    # seconds to wait for the API before falling back to the snapshot
+    timeout: float = 5
+
+
 class Configuration(BaseModel):
     api_url: str
     local_folder: Path
@@ -37,6 +89,15 @@ class Configuration(BaseModel):
     irr_colname: IrrColname
     sfcr_colnames: list[str]
     daq_colnames: DaqColnames
+    http: Http = Http()
+    ranges: Ranges = Ranges()
+    derivatives: Derivatives = Derivatives()
+    metadata: MetadataCache = MetadataCache()
+    # daily data quality reports are written here when set
+    quality_folder: Path = None
+    # SQLite store of the uploaded results and of the requests not delivered
+    # yet, unchanged rows are not posted again; off when not set
+    results_path: Path = None
 
 
 class Location(BaseModel):
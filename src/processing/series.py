@@ -0,0 +1,47 @@
+from datetime import date
+
+import numpy as np
+
+from . import encode
+
+
+class MinuteSeries:
+    """One day of a per minute variable, without the dt/val DataFrame.
+
+    Only the minutes with a value are kept, as int16 minute of day offsets
+    and float64 values, which is ~10 bytes per minute instead of the ~16
+    bytes plus index and block overhead of a frame. Values stay float64 so
+    that what is posted is what was computed.
+    """
+
+    __slots__ = ("day", "minutes", "values")
+
+    def __init__(self, day: date, minutes: np.ndarray, values: np.ndarray):
+        self.day = day
+        self.minutes = np.asarray(minutes, dtype=np.int16)
+        self.values = np.asarray(values, dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, day: date, values: np.ndarray):
+        # values of every minute of the day, nan where missing
+        minutes = np.flatnonzero(~np.isnan(values))
+        return cls(day, minutes, values[minutes])
+
+    def __repr__(self):
+        return f"MinuteSeries({self.day}, {len(self)} minutes)"
+
+    def __len__(self):
+        return len(self.minutes)
+
+    @property
+    def empty(self):
+        return len(self.minutes) == 0
+
+    @property
+    def dt(self):
+        start = np.datetime64(self.day, "ns")
+        return start + self.minutes.astype(np.int64) * np.timedelta64(1, "m")
+
+    def to_json(self):
+        # dt strings and values as arrays, encoded by encode.dumps
+        return dict(dt=encode.dt_strings(self.dt), val=self.values.round(4))
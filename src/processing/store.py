@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# history of raw measurements, one parquet file per day:
+# {root}/{kind}/{name}/{YYYY}/{MM}/{YYYY-MM-DD}.parquet
+# kind is "daq" (name = loc) or "sfcr" (name = f"{loc}_{mod}")
+
+
+def partition_path(root: Path, kind: str, name: str, day: date):
+    folder = Path(root) / kind / name / day.strftime("%Y/%m")
+    return folder / day.strftime("%Y-%m-%d.parquet")
+
+
+def days(root: Path, kind: str, name: str):
+    folder = Path(root) / kind / name
+    return sorted(
+        date.fromisoformat(path.stem) for path in folder.glob("*/*/*.parquet")
+    )
+
+
+def last_day(root: Path, kind: str, name: str):
+    stored = days(root, kind, name)
+    return stored[-1] if stored else None
+
+
+def _typed(df: pd.DataFrame):
+    df = df.astype({col: float for col in df.columns if col != "dt"})
+    df["dt"] = pd.to_datetime(df["dt"])
+    return df
+
+
+def write_day(root: Path, kind: str, name: str, day: date, df: pd.DataFrame):
+    # only the partition of the day is (re)written
+    path = partition_path(root, kind, name, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix(".tmp")
+    _typed(df).to_parquet(tmp, index=False)
+    tmp.replace(path)
+    return path
+
+
+def _read_partition(path: Path, columns: list[str] = None):
+    if columns is not None:
+        # columns missing in the partition are returned as nan
+        names = pq.read_schema(path).names
+        df = pd.read_parquet(path, columns=[col for col in columns if col in names])
+        return df.reindex(columns=columns)
+    return pd.read_parquet(path)
+
+
+def read(
+    root: Path,
+    kind: str,
+    name: str,
+    start: date = None,
+    end: date = None,
+    columns: list[str] = None,
+):
+    # days from start to end, both included, with only the requested columns
+    if start is None or end is None:
+        stored = days(root, kind, name)
+        if not stored:
+            return _typed(pd.DataFrame(columns=["dt"] + (columns or [])))
+        start = start or stored[0]
+        end = end or stored[-1]
+
+    if columns is not None:
+        columns = ["dt"] + [col for col in columns if col != "dt"]
+
+    frames = list()
+    day = start
+    while day <= end:
+        path = partition_path(root, kind, name, day)
+        if path.exists():
+            frames.append(_read_partition(path, columns))
+        day += timedelta(days=1)
+
+    if not frames:
+        return _typed(pd.DataFrame(columns=columns or ["dt"]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def migrate_csv(
+    filepath: Path, root: Path, kind: str, name: str, chunksize: int = 10**6
+):
+    # one time conversion of a daq_{loc}.csv / sfcr_{loc}_{mod}.csv history
+    written = set()
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        chunk = _typed(chunk).dropna(subset=["dt"])
+        for day, df in chunk.groupby(chunk["dt"].dt.date):
+            if day in written:
+                # day split between two chunks
+                path = partition_path(root, kind, name, day)
+                df = pd.concat([pd.read_parquet(path), df], ignore_index=True)
+            write_day(root, kind, name, day, df)
+            written.add(day)
+    return sorted(written)
+
+
+class DayIndex:
+    """Day slices of a frame sorted by dt, found by binary search.
+
+    Replaces `(day <= df["dt"]) & (df["dt"] < next_day)` masks, which scan
+    the whole frame once per day.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.dt = np.asarray(df["dt"], dtype="datetime64[ns]")
+
+    def day(self, day: date):
+        start = np.datetime64(pd.Timestamp(day).normalize(), "ns")
+        end = start + np.timedelta64(1, "D")
+        lo, hi = np.searchsorted(self.dt, [start, end])
+        return self.df.iloc[lo:hi]
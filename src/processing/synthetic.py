@@ -0,0 +1,224 @@
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import metadata, schemas, utils
+
+# raw daily files shaped like the ones of the stations: 1 Hz ";" separated
+# rows without header, in the column layouts of the configuration. The DAQ
+# logs day and night, the inverters only while the sun is up. Every day has
+# a few gaps and outliers (spikes, NAN readings and a stuck sensor).
+
+SECONDS = 86400
+SUNRISE, SUNSET = 6 * 3600, 18 * 3600
+# inverters switch on and off a bit after sunrise and before sunset
+INVERTER_ON, INVERTER_OFF = SUNRISE - 15 * 60, SUNSET + 15 * 60
+
+
+class Day:
+    """Random state of a synthetic day at a location, one sample per second."""
+
+    def __init__(self, rng: np.random.Generator, interval: int = 1):
+        self.rng = rng
+        self.seconds = np.arange(0, SECONDS, interval)
+        self.time = pd.to_timedelta(self.seconds, unit="s") + pd.Timestamp(0)
+        self.time = np.asarray(self.time.strftime("%H:%M:%S"), dtype=object)
+
+        # clear sky irradiance times a cloud factor that changes by the minute
+        angle = (self.seconds - SUNRISE) / (SUNSET - SUNRISE) * np.pi
+        clear = 1100 * np.clip(np.sin(angle), 0, None) ** 1.2
+        cover = rng.uniform(0, 0.6)
+        walk = np.cumsum(rng.normal(0, 1, utils.MINUTES))
+        walk = np.abs(walk - np.convolve(walk, np.ones(30) / 30, "same"))
+        clouds = np.clip(1 - cover * walk / (walk.max() or 1), 0.1, 1)
+        self.irr = clear * clouds[self.seconds // 60]
+
+        # modules heat up with the irradiance, a few minutes behind it
+        lag = np.convolve(self.irr, np.ones(300) / 300, "full")[: len(self.irr)]
+        self.t_mod = rng.uniform(8, 20) + 0.03 * lag
+
+    def noise(self, scale: float):
+        return self.rng.normal(0, scale, len(self.seconds))
+
+    def power(self, p_m: float):
+        # dc and ac power of a system of nominal power p_m
+        derate = 1 - 0.004 * (self.t_mod - 25)
+        p_dc = p_m * self.irr / 1000 * derate + self.noise(0.002 * p_m)
+        p_ac = 0.96 * p_dc - 0.005 * p_m
+        return np.clip(p_dc, -0.005 * p_m, None), np.clip(p_ac, -0.005 * p_m, None)
+
+    def spikes(self, values: np.ndarray, n: int, low: float, high: float):
+        i = self.rng.integers(0, len(values), n)
+        values[i] = self.rng.choice([low, high], n)
+
+    def stuck(self, values: np.ndarray, minutes: int):
+        start = self.rng.integers(0, len(values) - minutes * 60)
+        values[start : start + minutes * 60] = values[start]
+
+    def nans(self, values: np.ndarray, fraction: float):
+        values[self.rng.random(len(values)) < fraction] = np.nan
+
+    def gaps(self, n: int, max_minutes: int, rows: np.ndarray = None):
+        # rows kept once n runs of up to max_minutes are dropped
+        keep = np.ones(len(self.seconds), dtype=bool) if rows is None else rows.copy()
+        for _ in range(n):
+            length = self.rng.integers(1, max_minutes + 1) * 60
+            start = self.rng.integers(0, len(self.seconds) - length)
+            keep[(start <= self.seconds) & (self.seconds < start + length)] = False
+        return keep
+
+
+def _write(filepath: Path, day: date, state: Day, keep: np.ndarray, columns: dict):
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    # rounded before writing, a float_format is formatted value by value
+    df = pd.DataFrame({name: values[keep] for name, values in columns.items()})
+    df = df.round(3)
+    df.insert(0, "time", state.time[keep])
+    df.insert(0, "day", day.strftime("%d/%m/%Y"))
+    df.to_csv(filepath, sep=";", header=False, index=False, na_rep="NAN")
+
+
+def location_day(
+    folder: Path,
+    config: schemas.Configuration,
+    meta: metadata.Metadata,
+    loc: schemas.Location,
+    day: date,
+    seed: int = 0,
+    interval: int = 1,
+):
+    # DAQ file of the location and SFCR files of its systems for a day
+    rng = np.random.default_rng(
+        [seed, day.toordinal(), schemas.LOCATIONS.index(loc.loc)]
+    )
+    state = Day(rng, interval)
+    systems = meta.location_systems(loc.loc)
+
+    irr_colname = config.irr_colname.__getattribute__(loc.loc)
+    columns = dict()
+    for name in config.daq_colnames.__getattribute__(loc.loc)[2:]:
+        if name.startswith("t_mod"):
+            values = state.t_mod + state.noise(0.2)
+        elif name == irr_colname:
+            values = state.irr + state.noise(2)
+            state.spikes(values, 5, -300, 3000)
+        else:
+            # reference cells and other sensors
+            values = rng.uniform(0.9, 1.05) * state.irr + state.noise(5)
+        state.nans(values, 0.0005)
+        columns[name] = values
+    t_mod = [name for name in columns if name.startswith("t_mod")]
+    state.stuck(columns[rng.choice(t_mod)], 10)
+
+    keep = state.gaps(3, 15)
+    daq = config.daq.__getattribute__(loc.loc)
+    filepath = utils.daq_filepath(folder, loc.loc, daq, day)
+    _write(filepath, day, state, keep, columns)
+
+    on = (INVERTER_ON <= state.seconds) & (state.seconds < INVERTER_OFF)
+    for sys in systems:
+        p_dc, p_ac = state.power(sys.p_m)
+        state.spikes(p_dc, 3, -sys.p_m, 3 * sys.p_m)
+        v_dc = 300 + state.noise(5)
+        v_ac = 220 + state.noise(1)
+        s_ac = np.abs(p_ac) * 1.02
+        columns = dict(
+            i_dc=p_dc / v_dc,
+            v_dc=v_dc,
+            p_dc=p_dc,
+            i_ac=s_ac / v_ac,
+            v_ac=v_ac,
+            p_ac=p_ac,
+            f_ac=60 + state.noise(0.02),
+            q_ac=np.sqrt(s_ac**2 - p_ac**2),
+            s_ac=s_ac,
+        )
+        for values in columns.values():
+            state.nans(values, 0.0002)
+
+        keep = state.gaps(2, 10, on)
+        filepath = utils.sfcr_filepath(folder, sys.loc, sys.sfcr, sys.mod, day)
+        _write(filepath, day, state, keep, columns)
+
+
+def systems_metadata(locations: list[str] = None) -> metadata.Metadata:
+    # locations, modules and systems of the stations, as the API returns them
+    locations = locations or schemas.LOCATIONS
+    modules = [
+        dict(
+            mod=mod,
+            technology=mod,
+            area=1.6,
+            p_m=p_m / 6,
+            efficiency=0.18,
+            alpha=0,
+            beta=0,
+            gamma=0,
+            noct=45,
+        )
+        for mod, p_m in schemas.NOMINAL_POWERS.items()
+    ]
+    return metadata.Metadata(
+        dict(
+            locations=[
+                dict(
+                    loc=loc,
+                    region=loc,
+                    city=loc,
+                    label=loc.upper(),
+                    daq=loc,
+                    latitude=-12,
+                    longitude=-77,
+                    altitude=0,
+                )
+                for loc in locations
+            ],
+            modules=modules,
+            systems=[
+                dict(
+                    sys=f"{loc}-{mod}",
+                    loc=loc,
+                    mod=mod,
+                    sfcr=f"sfcr{i + 1}",
+                    p_m=p_m,
+                    series=6,
+                    parallel=1,
+                    modules=6,
+                    area=9.6,
+                    commisioned=date(2020, 1, 1),
+                    inclination=10,
+                    orientation="N",
+                    azimuth=0,
+                )
+                for loc in locations
+                for i, (mod, p_m) in enumerate(schemas.NOMINAL_POWERS.items())
+            ],
+        )
+    )
+
+
+def write(
+    folder: Path,
+    config: schemas.Configuration,
+    days: list[date],
+    locations: list[str] = None,
+    seed: int = 0,
+    interval: int = 1,
+    overwrite: bool = False,
+) -> metadata.Metadata:
+    # raw files of every location and day under folder, in the layout of
+    # config.local_folder; returns the metadata of the generated systems.
+    # The same seed writes the same files, existing days are kept unless
+    # overwrite is set
+    meta = systems_metadata(locations)
+    for day in days:
+        for loc in meta.locations:
+            daq = config.daq.__getattribute__(loc.loc)
+            if utils.daq_filepath(Path(folder), loc.loc, daq, day).exists():
+                if not overwrite:
+                    continue
+            print(loc.loc, day)
+            location_day(Path(folder), config, meta, loc, day, seed, interval)
+    return meta
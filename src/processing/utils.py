@@ -1,10 +1,26 @@
 import requests
+import threading
+from collections import OrderedDict
 from datetime import date, datetime
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from scipy.integrate import trapezoid
 
-import schemas
+from . import client, encode, instrument, schemas
+
+# parsed files kept in memory, oldest evicted first
+READ_CACHE_SIZE = 32
+_read_cache = OrderedDict()
+_read_lock = threading.Lock()
+
+# rows parsed at once, memory stays flat however long the file is
+READ_CHUNKSIZE = 50_000
+
+# one slot per minute of the day
+MINUTES = 1440
+MINUTE_NS = 60 * 10**9
+DAY_NS = MINUTES * MINUTE_NS
 
 
 def get_systems(api_url: str, loc: str):
@@ -54,27 +70,190 @@ def sfcr_filepath(local_folder: Path, loc: str, sfcr: str, mod: str, day: date):
     return filepath
 
 
-def read_file(filepath: Path, names: list[str], day: date):
+def daq_usecols(config: schemas.Configuration, loc: str, systems: list):
+    # only the columns used by the systems of the location are parsed
+    usecols = [config.irr_colname.__getattribute__(loc)]
+    usecols += [f"t_mod_{s}_{sys.mod}" for sys in systems for s in ["c", "s"]]
+    return usecols
+
+
+def read_daq(
+    config: schemas.Configuration, day: date, loc: str, systems: list, usecols=True
+):
+    # DAQ frame of a location, shared by every system of it through the cache
+    filepath = daq_filepath(
+        config.local_folder, loc, config.daq.__getattribute__(loc), day
+    )
+    names = config.daq_colnames.__getattribute__(loc)
+    usecols = daq_usecols(config, loc, systems) if usecols else None
+    return read_file(filepath, names, day, loc, usecols)
+
+
+def read_file(
+    filepath: Path,
+    names: list[str],
+    day: date,
+    loc: str = None,
+    usecols: list[str] = None,
+    chunksize: int = READ_CHUNKSIZE,
+):
+    # frames returned from the cache are shared, callers must not modify them inplace
     try:
-        df = pd.read_csv(filepath, sep=";", names=names)
+        stat = Path(filepath).stat()
+        mtime, size = stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        mtime, size = None, 0
+
+    # everything that shapes the frame is part of the key
+    key = (
+        loc,
+        day,
+        str(filepath),
+        mtime,
+        tuple(names),
+        usecols and tuple(usecols),
+        chunksize,
+    )
+    if mtime is not None:
+        with _read_lock:
+            if key in _read_cache:
+                _read_cache.move_to_end(key)
+                instrument.add(cached=1, rows_out=len(_read_cache[key]))
+                return _read_cache[key]
+
+    df = _parse_file(filepath, names, day, usecols, chunksize)
+    instrument.add(bytes=size)
+
+    if mtime is not None:
+        with _read_lock:
+            _read_cache[key] = df
+            while len(_read_cache) > READ_CACHE_SIZE:
+                _read_cache.popitem(last=False)
+    return df
 
-        day = day.strftime("%Y-%m-%d")
-        df["day"] = day
-        df["dt"] = df["day"] + " " + df["time"]
-        df["dt"] = pd.to_datetime(df["dt"])
 
-        df.drop(labels=["day", "time"], axis="columns", inplace=True)
+def clear_read_cache():
+    with _read_lock:
+        _read_cache.clear()
 
-        grouper = pd.Grouper(key="dt", freq="min")
-        df = df.groupby(grouper).mean()
 
-        df.reset_index(inplace=True)
+def minute_slots(dt):
+    # minute of the day of every timestamp, -1 where it is missing
+    dt = np.asarray(pd.to_datetime(dt), dtype="datetime64[ns]")
+    slots = (dt.view("i8") % DAY_NS) // MINUTE_NS
+    slots[np.isnat(dt)] = -1
+    return slots
 
+
+def time_slots(time: pd.Series):
+    # minute of the day of "HH:MM:SS" strings, -1 where the time can't be read
+    try:
+        chars = time.to_numpy(dtype=object).astype("S8")
+    except UnicodeEncodeError:
+        # corrupted rows with other than ASCII characters don't match
+        chars = np.array([str(t).encode("ascii", "replace") for t in time], dtype="S8")
+    chars = chars.view(np.uint8).reshape(-1, 8)
+    digits = chars.astype(np.int32) - ord("0")
+
+    numbers = digits[:, [0, 1, 3, 4, 6, 7]]
+
+    hour = digits[:, 0] * 10 + digits[:, 1]
+    minute = digits[:, 3] * 10 + digits[:, 4]
+    valid = (
+        (chars[:, [2, 5]] == ord(":")).all(axis=1)
+        & ((0 <= numbers) & (numbers <= 9)).all(axis=1)
+        & (hour < 24)
+        & (minute < 60)
+    )
+    slots = np.where(valid, hour * 60 + minute, -1)
+
+    # other forms, e.g. "9:00:00", are left to pandas
+    other = np.flatnonzero(~valid & time.notna().to_numpy())
+    if len(other):
+        delta = pd.to_timedelta(time.iloc[other].astype(str), errors="coerce")
+        minutes = np.asarray(delta.dt.total_seconds()) // 60
+        read = (0 <= minutes) & (minutes < MINUTES)
+        slots[other[read]] = minutes[read]
+    return slots
+
+
+def fold_minutes(slots: np.ndarray, values: np.ndarray, sums, counts):
+    # add every column of values to its per minute sums and counts
+    for i in range(values.shape[1]):
+        val = values[:, i]
+        mask = (slots >= 0) & ~np.isnan(val)
+        sums[:, i] += np.bincount(slots[mask], weights=val[mask], minlength=MINUTES)
+        counts[:, i] += np.bincount(slots[mask], minlength=MINUTES)
+
+
+def fold_csv(
+    source,
+    names: list[str],
+    columns: list[str],
+    sums: np.ndarray,
+    counts: np.ndarray,
+    chunksize: int = READ_CHUNKSIZE,
+):
+    # samples are folded into per minute sums as the file is read,
+    # returns the last minute of the day seen or -1
+    reader = pd.read_csv(
+        source,
+        sep=";",
+        names=names,
+        usecols=["time"] + columns,
+        dtype=dict(time=str),
+        na_values=["NAN"],
+        chunksize=chunksize,
+    )
+    last = -1
+    skipped = 0
+    for chunk in [reader] if chunksize is None else reader:
+        slots = time_slots(chunk["time"])
+        for col in columns:
+            # other tokens than numbers and NAN are read as missing
+            if not pd.api.types.is_numeric_dtype(chunk[col]):
+                chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        fold_minutes(slots, values, sums, counts)
+        last = max(last, slots.max(initial=-1))
+        skipped += int((slots < 0).sum())
+
+    if skipped:
+        print("rows without a valid time skipped", skipped)
+        instrument.add(skipped=skipped)
+    return last
+
+
+def _parse_file(
+    filepath: Path,
+    names: list[str],
+    day: date,
+    usecols: list[str] = None,
+    chunksize: int = READ_CHUNKSIZE,
+):
+    columns = [name for name in names if name not in ["day", "time"]]
+    if usecols is not None:
+        columns = [name for name in columns if name in usecols]
+
+    sums = np.zeros((MINUTES, len(columns)))
+    counts = np.zeros((MINUTES, len(columns)), dtype=np.int64)
+
+    try:
+        fold_csv(filepath, names, columns, sums, counts, chunksize)
     except FileNotFoundError:
         print("filenorfounderror", day, filepath)
-        df = pd.DataFrame(columns=names)
-        df["dt"] = df["day"] + " " + df["time"]
-        df.drop(labels=["day", "time"], axis="columns", inplace=True)
+        instrument.add(missing=1)
+
+    slots = np.flatnonzero(counts.any(axis=1))
+    # samples with a valid time in, minutes out
+    instrument.add(
+        rows_in=int(counts.max(axis=1, initial=0).sum()), rows_out=len(slots)
+    )
+    with np.errstate(invalid="ignore"):
+        means = sums[slots] / counts[slots]
+
+    df = pd.DataFrame(means, columns=columns)
+    df.insert(0, "dt", pd.Timestamp(day) + pd.to_timedelta(slots, unit="min"))
     return df
 
 
@@ -83,61 +262,71 @@ def get_variable(df: pd.DataFrame, colname):
     try:
         df = df[["dt", colname]]
     except KeyError:
-        return pd.DataFrame(columns=["dt", "val"])
+        return pd.DataFrame(
+            dict(dt=pd.Series(dtype="datetime64[ns]"), val=pd.Series(dtype=float))
+        )
     df.rename({colname: "val"}, axis="columns", inplace=True)
     df.dropna(inplace=True)
 
     return df
 
 
-def post_irr(df, loc: str, api_url: str):
-    df = df.copy()
-    df = df[["dt", "val"]].copy().dropna()
-    if df.empty:
-        print(f"Irradiances empty")
-        return
-    df.sort_values("dt", ignore_index=True, inplace=True)
-    df["dt"] = df["dt"].astype(str)
-    dct = df.to_dict("list")
-    dct["loc"] = loc
-    response = requests.post(f"{api_url}/irradiances/", json=dct)
+def _post(url: str, json: dict, message: str, detail):
+    def check(response):
+        if response.status_code != 200:
+            print(f"{message} {response.status_code}")
+            print(detail)
 
-    if response.status_code != 200:
-        print(f"Irradiances post response {response.status_code}")
-        print(df)
+    return client.get_client().post(url, json, check)
 
 
-def post_tmod(df, sys: str, api_url: str):
-    df = df[["dt", "val"]].copy().dropna()
-    if df.empty:
-        print(f"tmod empty")
-        return
-    df.sort_values("dt", ignore_index=True, inplace=True)
-    df["dt"] = df["dt"].astype(str)
-    dct = df.to_dict("list")
-    dct["sys"] = sys
-    response = requests.post(f"{api_url}/module_temperatures/", json=dct)
+def _series_json(data):
+    # dt / val arrays of a series.MinuteSeries or of a dt / val frame
+    if not isinstance(data, pd.DataFrame):
+        return data.to_json()
+    df = data[["dt", "val"]].dropna().sort_values("dt", ignore_index=True)
+    return dict(dt=encode.dt_strings(df["dt"]), val=df["val"].to_numpy(dtype=float))
 
-    if response.status_code != 200:
-        print(f"Temp Mod post response {response.status_code}")
-        print(df)
 
+def _post_series(url: str, data, fields: dict, message: str, empty: str):
+    results = client.get_client().results
+    if results is None or isinstance(data, pd.DataFrame):
+        dct = _series_json(data)
+        if len(dct["dt"]) == 0:
+            print(empty)
+            return
+        dct.update(fields)
+        return _post(url, dct, message, data)
 
-def post_power(df, sys: str, typ: str, api_url: str):
-    df = df[["dt", "val"]].copy().dropna()
-    if df.empty:
-        print(f"Power empty")
+    if data.empty:
+        print(empty)
+        return
+    # only the minutes new or changed since the series was last queued
+    owner, typ = fields.get("loc") or fields["sys"], fields.get("type", "")
+    delta = results.series_delta(url, owner, typ, data)
+    if delta.empty:
         return
-    df.sort_values("dt", ignore_index=True, inplace=True)
-    df["dt"] = df["dt"].astype(str)
-    dct = df.to_dict("list")
-    dct["sys"] = sys
-    dct["type"] = typ
-    response = requests.post(f"{api_url}/powers/", json=dct)
+    with results.transaction():
+        results.series_queued(url, owner, typ, delta)
+        return _post(url, dict(delta.to_json(), **fields), message, delta)
+
+
+def post_irr(data, loc: str, api_url: str):
+    url = f"{api_url}/irradiances/"
+    message = "Irradiances post response"
+    return _post_series(url, data, dict(loc=loc), message, "Irradiances empty")
 
-    if response.status_code != 200:
-        print(f"Powers post response {response.status_code}")
-        print(df)
+
+def post_tmod(data, sys: str, api_url: str):
+    url = f"{api_url}/module_temperatures/"
+    message = "Temp Mod post response"
+    return _post_series(url, data, dict(sys=sys), message, "tmod empty")
+
+
+def post_power(data, sys: str, typ: str, api_url: str):
+    url = f"{api_url}/powers/"
+    message = "Powers post response"
+    return _post_series(url, data, dict(sys=sys, type=typ), message, "Power empty")
 
 
 def energy(dt: list[datetime], val: list[float]):
@@ -175,35 +364,40 @@ def get_params(
     return dict(day=day, h=h, e_dc=e_dc, e_ac=e_ac)
 
 
-def post_energy(sys: str, typ: str, day: date, energy: float, api_url: str):
+def post_energy(sys: str, typ: str, day: date, energy: float, api_url: str, batch=None):
     day = day.strftime("%Y-%m-%d")
     if energy is None:
         return
     energy = round(energy, 4)
+    if batch is not None:
+        return batch.add("energies", dict(sys=sys, type=typ), dict(day=day, val=energy))
     json = dict(sys=sys, type=typ, day=[day], val=[energy])
-    response = requests.post(f"{api_url}/energies/", json=json)
+    return _post(f"{api_url}/energies/", json, f"Energy {typ} POST response", json)
 
-    if response.status_code != 200:
-        print(f"Energy {typ} POST response {response.status_code}")
-        print(json)
 
-
-def post_yield(sys: str, typ: str, day: date, e: float, nominal: float, api_url: str):
+def post_yield(
+    sys: str, typ: str, day: date, e: float, nominal: float, api_url: str, batch=None
+):
     day = day.strftime("%Y-%m-%d")
     if e is None:
         return
     yld = e / nominal
     val = round(yld, 4)
+    if batch is not None:
+        return batch.add("yields", dict(sys=sys, type=typ), dict(day=day, val=val))
     json = dict(sys=sys, type=typ, day=[day], val=[val])
-    response = requests.post(f"{api_url}/yields/", json=json)
-
-    if response.status_code != 200:
-        print(f"Yield {typ} POST response {response.status_code}")
-        print(json)
+    return _post(f"{api_url}/yields/", json, f"Yield {typ} POST response", json)
 
 
 def post_efficiency(
-    sys: str, day: date, e_dc: float, e_ac: float, h: float, area: float, api_url: str
+    sys: str,
+    day: date,
+    e_dc: float,
+    e_ac: float,
+    h: float,
+    area: float,
+    api_url: str,
+    batch=None,
 ):
     day = day.strftime("%Y-%m-%d")
     if e_dc is not None:
@@ -218,16 +412,22 @@ def post_efficiency(
     if (e_dc is None) & (e_ac is None) & (h_area is None):
         print(day, "efficiency values are all None")
         return
+    if batch is not None:
+        row = dict(day=day, e_dc=e_dc, e_ac=e_ac, h=h_area)
+        return batch.add("efficiencies", dict(sys=sys), row)
     json = dict(sys=sys, day=[day], e_dc=[e_dc], e_ac=[e_ac], h=[h_area])
-    response = requests.post(f"{api_url}/efficiencies/", json=json)
-
-    if response.status_code != 200:
-        print(f"Efficiency POST response {response.status_code}")
-        print(json)
+    return _post(f"{api_url}/efficiencies/", json, "Efficiency POST response", json)
 
 
 def post_performance_ratio(
-    sys: str, day: date, h: float, e_dc: float, e_ac: float, p_m: float, api_url: str
+    sys: str,
+    day: date,
+    h: float,
+    e_dc: float,
+    e_ac: float,
+    p_m: float,
+    api_url: str,
+    batch=None,
 ):
     day = day.strftime("%Y-%m-%d")
     if h is not None:
@@ -248,8 +448,35 @@ def post_performance_ratio(
     if (y_r is None) & (y_a is None) & (y_f is None):
         print(day, "PR values are all None")
         return
+    if batch is not None:
+        row = dict(day=day, y_r=y_r, y_a=y_a, y_f=y_f)
+        return batch.add("performance_ratios", dict(sys=sys), row)
     json = dict(sys=sys, day=[day], y_r=[y_r], y_a=[y_a], y_f=[y_f])
-    response = requests.post(f"{api_url}/performance_ratios/", json=json)
-    if response.status_code != 200:
-        print(f"PR POST response {response.status_code}")
-        print(json)
+    return _post(f"{api_url}/performance_ratios/", json, "PR POST response", json)
+
+
+def post_system(
+    sys: schemas.System,
+    day: date,
+    variables: dict,
+    params: dict,
+    api_url: str,
+    batch=None,
+):
+    # per minute series and daily KPIs of a system, irradiance is posted per location
+    post_tmod(variables["t_mod"], sys.sys, api_url)
+    post_power(variables["p_dc"], sys.sys, "dc", api_url)
+    post_power(variables["p_ac"], sys.sys, "ac", api_url)
+
+    h, e_dc, e_ac = params["h"], params["e_dc"], params["e_ac"]
+    post_energy(sys.sys, "dc", day, e_dc, api_url, batch)
+    post_energy(sys.sys, "ac", day, e_ac, api_url, batch)
+
+    post_yield(sys.sys, "r", day, h, 1000, api_url, batch)
+    post_yield(sys.sys, "a", day, e_dc, sys.p_m, api_url, batch)
+    post_yield(sys.sys, "f", day, e_ac, sys.p_m, api_url, batch)
+
+    # efficiency and performance ratio only on the synchronized minutes
+    e_dc, e_ac, h = params["e_dc_sync"], params["e_ac_sync"], params["h_sync"]
+    post_efficiency(sys.sys, day, e_dc, e_ac, h, sys.area, api_url, batch)
+    post_performance_ratio(sys.sys, day, h, e_dc, e_ac, sys.p_m, api_url, batch)
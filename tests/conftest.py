@@ -0,0 +1,33 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# the package is run from src, see the README
+SRC = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from processing import client, schemas  # noqa: E402
+from stub import Stub  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    server = Stub()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def config(tmp_path, stub):
+    # sample configuration posting to the stub, raw files under tmp_path
+    dct = json.load(open(SRC / "sample_config.json"))
+    dct.update(
+        api_url=f"{stub.url}/processed",
+        local_folder=str(tmp_path / "data"),
+        http=dict(retries=0),
+    )
+    yield schemas.Configuration(**dct)
+    # the global client of the runs is closed with its store
+    client.configure()
@@ -0,0 +1,116 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Stub:
+    """Local stand-in of the API, counts connections and records every POST.
+
+    GETs are answered from `get` by path, after `get_delay` seconds, with the
+    `etag` and `last_modified` validators if set and 304 when the request
+    sends them back. Requests to a path containing a key of `fail` get that
+    status, POSTs 200 after `delay` seconds otherwise.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.get = dict()
+        self.get_delay = 0
+        self.etag = None
+        self.last_modified = None
+        self.gets = list()
+        self.fail = dict()
+        self.posts = list()
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                with stub.lock:
+                    stub.connections += 1
+                super().setup()
+
+            def reply(self, status: int, obj, headers: dict = None):
+                body = json.dumps(obj, default=str).encode()
+                self.send_response(status)
+                for name, value in (headers or dict()).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def failed(self):
+                return next(
+                    (status for key, status in stub.fail.items() if key in self.path),
+                    None,
+                )
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                with stub.lock:
+                    stub.gets.append((path, dict(self.headers)))
+                time.sleep(stub.get_delay)
+                validators = dict()
+                if stub.etag is not None:
+                    validators["ETag"] = stub.etag
+                if stub.last_modified is not None:
+                    validators["Last-Modified"] = stub.last_modified
+                sent = [
+                    self.headers.get("If-None-Match"),
+                    self.headers.get("If-Modified-Since"),
+                ]
+
+                if self.failed() is not None:
+                    self.reply(self.failed(), {})
+                elif path not in stub.get:
+                    self.reply(404, {})
+                elif validators and sent == [stub.etag, stub.last_modified]:
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self.reply(200, stub.get[path], validators)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                with stub.lock:
+                    stub.requests += 1
+                status = self.failed() or 200
+                if status == 200:
+                    time.sleep(stub.delay)
+                    with stub.lock:
+                        stub.posts.append((self.path, json.loads(body)))
+                self.reply(status, {})
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def serve(self, meta):
+        # locations, modules and systems of a metadata.Metadata
+        for name in ["locations", "modules", "systems"]:
+            self.get[f"/processed/{name}/"] = [
+                item.dict() for item in getattr(meta, name)
+            ]
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,18 @@
+from processing import bench
+
+
+def test_micro_restamp():
+    seconds = bench.MICRO["restamp"](1)
+    assert set(seconds) == {"legacy", "restamp"}
+    assert seconds["restamp"] < seconds["legacy"]
+
+
+def test_compare_micro():
+    baseline = dict(cases=dict(), micro=dict(restamp=dict(legacy=1.0, restamp=0.02)))
+    result = dict(cases=dict(), micro=dict(restamp=dict(legacy=1.1, restamp=0.05)))
+    assert bench.compare(result, baseline) == ["restamp restamp: 2.50x slower"]
+
+
+def test_micro_concat():
+    seconds = bench.MICRO["concat"](1, sizes=(2, 4))
+    assert set(seconds) == {"legacy_2", "collect_2", "legacy_4", "collect_4"}
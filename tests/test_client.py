@@ -0,0 +1,63 @@
+import time
+
+from processing import client
+from stub import Stub
+
+
+def _post_all(http: client.Client, url: str, n: int):
+    for i in range(n):
+        http.post(f"{url}/processed/powers/", dict(i=i))
+    return http.wait()
+
+
+def test_connections_are_reused(stub):
+    http = client.Client(workers=4)
+    responses = _post_all(http, stub.url, 40)
+    http.close()
+
+    assert [r.status_code for r in responses] == [200] * 40
+    assert len(stub.posts) == 40
+    # one keep-alive connection per worker at most
+    assert stub.connections <= 4
+
+
+def test_posts_are_concurrent():
+    stub = Stub(delay=0.05)
+    try:
+        start = time.perf_counter()
+        http = client.Client(workers=1)
+        _post_all(http, stub.url, 8)
+        serial = time.perf_counter() - start
+        http.close()
+
+        start = time.perf_counter()
+        http = client.Client(workers=8)
+        _post_all(http, stub.url, 8)
+        concurrent = time.perf_counter() - start
+        http.close()
+    finally:
+        stub.close()
+
+    assert serial >= 8 * 0.05
+    assert concurrent < serial / 2
+
+
+def test_post_retried_when_refused(stub):
+    stub.fail["powers"] = 503
+    http = client.Client(retries=2, backoff=0)
+    (response,) = _post_all(http, stub.url, 1)
+    http.close()
+
+    assert response.status_code == 503
+    assert stub.requests == 3
+
+
+def test_post_not_retried_on_server_error(stub):
+    # the API may have inserted the rows before failing
+    stub.fail["powers"] = 500
+    http = client.Client(retries=2, backoff=0)
+    (response,) = _post_all(http, stub.url, 1)
+    http.close()
+
+    assert response.status_code == 500
+    assert stub.requests == 1
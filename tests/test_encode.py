@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import encode, series, utils
+
+DAY = pd.Timestamp("2024-03-01").date()
+
+
+@pytest.fixture(params=["orjson", "json"])
+def dumps(request, monkeypatch):
+    if request.param == "orjson" and encode.orjson is None:
+        pytest.skip("orjson not installed")
+    if request.param == "json":
+        monkeypatch.setattr(encode, "orjson", None)
+    return encode.dumps
+
+
+def test_dt_strings():
+    # whole seconds over several days, midnight and the last second included
+    rng = np.random.default_rng(0)
+    seconds = np.r_[0, 86399, 86400, rng.integers(0, 3 * 86400, 500)]
+    dt = pd.Series(pd.Timestamp(DAY) + pd.to_timedelta(seconds, "s"))
+    assert encode.dt_strings(dt).tolist() == dt.astype(str).tolist()
+    assert encode.dt_strings(dt[:0]).tolist() == []
+
+
+def _old_body(df: pd.DataFrame, **fields):
+    # as utils posted a variable before encode, with requests' json=
+    df = df.dropna().sort_values("dt", ignore_index=True)
+    df["dt"] = df["dt"].astype(str)
+    dct = df.to_dict("list")
+    dct.update(fields)
+    return json.dumps(dct, allow_nan=False).encode("utf-8")
+
+
+def test_dumps_as_old_payload(dumps):
+    rng = np.random.default_rng(1)
+    values = rng.normal(500, 300, utils.MINUTES)
+    values[rng.random(utils.MINUTES) < 0.3] = np.nan
+    values[:5] = [0.0, -0.00004, 1e-05, 1234.56785, 2.0]
+    data = series.MinuteSeries.from_array(DAY, values)
+    # rounded as the filters leave their frames
+    df = pd.DataFrame(dict(dt=data.dt, val=values[data.minutes].round(4)))
+
+    fields = dict(sys="pucp-perc", type="dc")
+    for source in [data, df]:
+        dct = utils._series_json(source)
+        dct.update(fields)
+        new, old = dumps(dct), _old_body(df, **fields)
+        assert json.loads(new) == json.loads(old)
+        # same keys in the same order, same float text
+        assert list(json.loads(new)) == list(json.loads(old))
+        assert new.replace(b" ", b"") == old.replace(b" ", b"")
+
+
+def test_dumps_rows(dumps):
+    # the daily rows, numpy scalars as python numbers
+    row = dict(day="2024-03-01", e_dc=np.float64(12.3456), n=np.int64(3), h=None)
+    assert json.loads(dumps(dict(sys="a", rows=[row]))) == dict(
+        sys="a", rows=[dict(day="2024-03-01", e_dc=12.3456, n=3, h=None)]
+    )
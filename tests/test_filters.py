@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import filters
+
+NAN = np.nan
+
+
+def minutes(n: int):
+    return np.arange(n) * 60.0
+
+
+def test_stuck_values():
+    val = np.array([1.0, 1.0, 1.0, 2.0, 3.0, 3.0, 4.0, 4.0, 4.0, 4.0])
+    assert filters.stuck_values(val, 3).tolist() == [
+        *[True] * 3,
+        *[False] * 3,
+        *[True] * 4,
+    ]
+    assert not filters.stuck_values(val, 5).any()
+
+
+def test_stuck_runs_across_nan():
+    # missing minutes don't break a run, and stay unflagged
+    val = np.array([5.0, 5.0, NAN, 5.0, NAN, 6.0, 6.0])
+    codes = filters.derivative_rules(minutes(len(val)), val, stuck=3)
+    assert codes.tolist() == [4, 4, 0, 4, 0, 0, 0]
+
+
+def test_dead_lower_limit():
+    # flat readings are dead only above the lower limit, e.g. irradiance at night
+    val = np.array([2.0, 2.0, 2.0, 10.0, 10.0, 10.0])
+    codes = filters.derivative_rules(
+        minutes(len(val)), val, dead=0.0001, dead_lower_limit=5
+    )
+    assert codes.tolist() == [0, 0, 0, 0, 2, 2]
+
+    codes = filters.derivative_rules(minutes(len(val)), val, dead=0.0001)
+    assert codes.tolist() == [0, 2, 2, 0, 2, 2]
+
+
+def test_abrupt_change():
+    # rates per second between consecutive values, nan minutes skipped
+    val = np.array([100.0, 110.0, 700.0, NAN, 710.0, 100.0])
+    codes = filters.derivative_rules(minutes(len(val)), val, abrupt=8)
+    assert codes.tolist() == [0, 0, 3, 0, 0, 3]
+
+
+@pytest.mark.parametrize(
+    "rules, expected",
+    [
+        (dict(dead=0.01), [0, 0, 2, 2, 0]),
+        (dict(abrupt=0.1), [0, 0, 0, 0, 3]),
+        # a stuck run is discarded whole
+        (dict(stuck=3), [0, 4, 4, 4, 0]),
+    ],
+)
+def test_first_value_of_run(rules, expected):
+    # the first value has no rate, the dead and abrupt rules keep it
+    val = np.array([NAN, 50.0, 50.0, 50.0, 100.0])
+    codes = filters.derivative_rules(minutes(len(val)), val, **rules)
+    assert codes.tolist() == expected
+
+
+def test_all_nan():
+    val = np.full(5, NAN)
+    codes = filters.derivative_rules(minutes(5), val, dead=1, abrupt=1, stuck=2)
+    assert not codes.any()
+
+
+def test_rules_as_legacy_filters():
+    # same rows as the dead_values and abrupt_change chain, except the first
+    # one, which abrupt_change drops for its missing derivative
+    rng = np.random.default_rng(0)
+    val = rng.choice([0.0, 3.0, 10.0, 500.0], 200) + rng.choice([0, 1e-4], 200)
+    val[rng.random(200) < 0.1] = NAN
+    seconds = np.sort(rng.choice(np.arange(0, 86400, 60), 200, replace=False))
+
+    df = pd.DataFrame(dict(dt=pd.Timestamp(2024, 3, 1) + pd.to_timedelta(seconds, "s")))
+    df["val"] = val
+    df = df.dropna()
+    df["derivative"] = filters.derivative(df, column="val")
+    legacy = filters.dead_values(df, derivative=0.0001, column="val", lower_limit=5)
+    legacy = filters.abrupt_change(legacy, upper_limit=1)
+
+    codes = filters.derivative_rules(
+        seconds.astype(float), val, dead=0.0001, dead_lower_limit=5, abrupt=1
+    )
+    kept = np.flatnonzero(~np.isnan(val) & (codes == 0))
+    assert len(kept) < len(df)
+    assert kept[1:].tolist() == legacy.index.tolist()
@@ -0,0 +1,67 @@
+from collections import Counter
+from datetime import date
+
+import numpy as np
+
+from processing import incremental, synthetic
+
+NAMES = ["day", "time", "a", "b"]
+
+
+def test_tail_reader_missing_column(tmp_path):
+    path = tmp_path / "raw.csv"
+    reader = incremental.TailReader(path, NAMES, ["a", "c"])
+    path.write_text("01/01/2024;09:00:00;1;2\n01/01/2024;09:01:00;3;4\n")
+    reader.read()
+
+    assert reader.complete == 540
+    means = reader.means(["a", "c"])
+    assert means[540, 0] == 1
+    assert np.isnan(means[540, 1])
+
+
+def test_tail_reader_appended_rows(tmp_path):
+    path = tmp_path / "raw.csv"
+    reader = incremental.TailReader(path, NAMES, ["a"])
+    path.write_text("01/01/2024;09:00:00;1;0\n01/01/2024;09:00:30;3")
+    reader.read()
+    with open(path, "a") as f:
+        f.write(";0\n01/01/2024;09:01:00;5;0\n")
+    reader.read()
+
+    assert reader.means(["a"])[540, 0] == 2
+    assert reader.means(["a"])[541, 0] == 5
+
+
+def test_new_minutes_nothing_complete():
+    state = dict(posted=dict(), integrals=dict())
+    values = np.arange(incremental.utils.MINUTES, dtype=float)
+
+    # no minute seen yet
+    assert len(incremental._new_minutes(state, "irr", values, -2)) == 0
+    assert state["integrals"]["irr"].total == 0
+
+    slots = incremental._new_minutes(state, "irr", values, 3)
+    assert slots.tolist() == [0, 1, 2, 3]
+    # the minute still being written is not posted again
+    assert len(incremental._new_minutes(state, "irr", values, 3)) == 0
+    assert incremental._new_minutes(state, "irr", values, 4).tolist() == [4]
+
+
+def test_tick_posts_only_changes(tmp_path, config, stub):
+    day = date(2024, 3, 1)
+    meta = synthetic.write(config.local_folder, config, [day], ["pucp"], interval=60)
+    stub.serve(meta)
+
+    incremental.run(config, tmp_path / "state", day)
+    posted = Counter(path.split("/")[-2] for path, _ in stub.posts)
+    n = len(meta.location_systems("pucp"))
+    assert posted["powers"] == 2 * n
+    # one batch per endpoint and type
+    assert posted["energies"] == 2 * n
+    assert posted["yields"] == 3 * n
+
+    # nothing appended, nothing posted
+    stub.posts.clear()
+    incremental.run(config, tmp_path / "state", day)
+    assert stub.posts == []
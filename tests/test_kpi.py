@@ -0,0 +1,150 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import kpi, pipeline
+
+DAYS = [date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3)]
+SYSTEMS = ["pucp-a", "pucp-b"]
+
+
+def minutes(day: date, seed: int):
+    # one day of minutes with gaps, irr and p_ac missing on different minutes
+    rng = np.random.default_rng(seed)
+    start = datetime.combine(day, datetime.min.time())
+    dt = [start + timedelta(minutes=int(m)) for m in range(360, 1080)]
+    shape = np.sin(np.linspace(0, np.pi, len(dt)))
+    df = pd.DataFrame(
+        dict(
+            dt=pd.to_datetime(dt),
+            irr=1000 * shape + rng.normal(0, 5, len(dt)),
+            p_dc=900 * shape + rng.normal(0, 5, len(dt)),
+            p_ac=850 * shape + rng.normal(0, 5, len(dt)),
+        )
+    )
+    for col in ["irr", "p_dc", "p_ac"]:
+        df.loc[rng.random(len(df)) < 0.1, col] = np.nan
+    return df.drop(index=np.flatnonzero(rng.random(len(df)) < 0.05))
+
+
+def frame(no_irradiance=()):
+    frames = []
+    for i, sys in enumerate(SYSTEMS):
+        for j, day in enumerate(DAYS):
+            df = minutes(day, 10 * i + j).assign(sys=sys)
+            if (sys, day) in no_irradiance:
+                df["irr"] = np.nan
+            frames.append(df)
+    # shuffled, daily_integrals sorts by itself
+    return pd.concat(frames).sample(frac=1, random_state=0)
+
+
+def expected(df: pd.DataFrame, day: date):
+    # pipeline.day_params of one day, None as NaN
+    rows = df[df["dt"].dt.date == day].sort_values("dt").reset_index(drop=True)
+    params = pipeline.day_params(rows, day)
+    return {k: np.nan if v is None else v for k, v in params.items()}
+
+
+def assert_day(row, params):
+    assert row["day"] == params["day"]
+    for col in kpi.COLUMNS[1:]:
+        assert np.isclose(row[col], params[col], equal_nan=True), col
+
+
+def test_daily_integrals_equals_day_params():
+    df = frame().query("sys == 'pucp-a'").drop(columns="sys")
+    daily = kpi.daily_integrals(df)
+    assert daily["day"].tolist() == DAYS
+    for _, row in daily.iterrows():
+        assert_day(row, expected(df, row["day"]))
+
+
+def test_daily_integrals_by_system():
+    df = frame(no_irradiance=[("pucp-b", DAYS[1])])
+    daily = kpi.daily_integrals(df, by="sys")
+    assert len(daily) == len(SYSTEMS) * len(DAYS)
+    for _, row in daily.iterrows():
+        assert_day(row, expected(df[df["sys"] == row["sys"]], row["day"]))
+    dark = daily[(daily["sys"] == "pucp-b") & (daily["day"] == DAYS[1])]
+    assert dark["h"].item() == 0
+    assert dark["h_sync"].isna().item()
+
+
+@pytest.mark.parametrize("by", [None, "sys"])
+def test_daily_integrals_days(by):
+    # a day without rows gets zero energies, like day_params of an empty day
+    df = frame()
+    df = df[df["dt"].dt.date != DAYS[1]]
+    if by is None:
+        df = df[df["sys"] == "pucp-a"].drop(columns="sys")
+    daily = kpi.daily_integrals(df, by=by, days=DAYS)
+    assert len(daily) == len(DAYS) * (1 if by is None else len(SYSTEMS))
+    for _, row in daily.iterrows():
+        rows = df if by is None else df[df["sys"] == row["sys"]]
+        assert_day(row, expected(rows, row["day"]))
+
+
+def old_yields(params: dict, p_m: float):
+    # the formulas post_results used before the KPI engine
+    def ratio(value, by):
+        return None if value is None else value / by
+
+    return dict(
+        y_r=ratio(params["h"], 1000),
+        y_a=ratio(params["e_dc"], p_m),
+        y_f=ratio(params["e_ac"], p_m),
+        y_r_sync=ratio(params["h_sync"], 1000),
+        y_a_sync=ratio(params["e_dc_sync"], p_m),
+        y_f_sync=ratio(params["e_ac_sync"], p_m),
+    )
+
+
+def test_indicators_match_old_formulas():
+    p_m = dict(zip(SYSTEMS, [1.5, 2.0]))
+    area = dict(zip(SYSTEMS, [8.0, 10.0]))
+    df = frame(no_irradiance=[("pucp-a", DAYS[0]), ("pucp-b", DAYS[2])])
+    result = kpi.kpis(df, p_m, area, by="sys")
+
+    for _, row in result.iterrows():
+        rows = df[df["sys"] == row["sys"]]
+        day = rows[rows["dt"].dt.date == row["day"]].sort_values("dt")
+        params = pipeline.day_params(day.reset_index(drop=True), row["day"])
+        old = old_yields(params, p_m[row["sys"]])
+        for col, value in old.items():
+            value = np.nan if value is None else value
+            assert np.isclose(row[col], value, equal_nan=True), col
+
+        if params["h_sync"] is None:
+            # no irradiance, no performance ratio or efficiency
+            assert np.isnan(row["pr"])
+            assert np.isnan(row["eff_dc"]) and np.isnan(row["eff_ac"])
+            continue
+        pr = old["y_f_sync"] / old["y_r_sync"]
+        h_area = params["h_sync"] * area[row["sys"]]
+        assert np.isclose(row["pr"], pr)
+        assert np.isclose(row["eff_dc"], params["e_dc_sync"] / h_area)
+        assert np.isclose(row["eff_ac"], params["e_ac_sync"] / h_area)
+
+
+def test_indicators_scalar_and_zero_irradiance():
+    # a day of zero irradiance gives NaN instead of an infinite PR
+    daily = pd.DataFrame(
+        dict(
+            day=DAYS[:2],
+            h=[0.0, 5000.0],
+            e_dc=[10.0, 4000.0],
+            e_ac=[9.0, 3800.0],
+            h_sync=[0.0, 4800.0],
+            e_dc_sync=[10.0, 3900.0],
+            e_ac_sync=[9.0, 3700.0],
+        )
+    )
+    result = kpi.indicators(daily, p_m=2.0, area=10.0)
+    assert result["y_r"].tolist() == [0.0, 5.0]
+    assert result["y_f"].tolist() == [4.5, 1900.0]
+    assert np.isnan(result["pr"][0]) and np.isnan(result["eff_dc"][0])
+    assert result["pr"][1] == pytest.approx(1850.0 / 4.8)
+    assert result["eff_ac"][1] == pytest.approx(3700.0 / 48000.0)
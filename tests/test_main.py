@@ -0,0 +1,46 @@
+import asyncio
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+from processing import __main__, main, runner, synthetic
+
+DAYS = [date(2024, 3, 1) + timedelta(days=i) for i in range(3)]
+
+
+@pytest.fixture
+def meta(config):
+    return synthetic.write(config.local_folder, config, DAYS, ["pucp"], interval=60)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_kpis_batched_over_days(config, meta, stub, concurrent):
+    if concurrent:
+        asyncio.run(runner.run_days(config, DAYS, 2, meta=meta))
+    else:
+        main.run_days(config, DAYS, meta=meta)
+
+    requests = Counter(path.split("/")[-2] for path, _ in stub.posts)
+    n = len(meta.location_systems("pucp"))
+    # one request per system, endpoint and type for the whole range
+    assert requests["energies"] == 2 * n
+    assert requests["yields"] == 3 * n
+    assert requests["efficiencies"] == n
+    assert requests["performance_ratios"] == n
+    for path, body in stub.posts:
+        if "energies" in path:
+            assert body["day"] == [str(day) for day in DAYS]
+
+    # series are posted per day
+    assert requests["irradiances"] == len(DAYS)
+    assert requests["powers"] == 2 * n * len(DAYS)
+
+
+def test_workers_need_concurrent(capsys):
+    with pytest.raises(SystemExit, match="--concurrent"):
+        __main__.main(["run-day", "--workers", "2"])
+    # the other commands take no --workers
+    with pytest.raises(SystemExit):
+        __main__.main(["intraday", "--state", "state", "--workers", "2"])
+    assert "unrecognized arguments: --workers" in capsys.readouterr().err
@@ -0,0 +1,85 @@
+import pytest
+import requests
+
+from processing import metadata, schemas, synthetic
+
+MODIFIED = "Fri, 01 Mar 2024 00:00:00 GMT"
+
+
+@pytest.fixture
+def served(stub):
+    meta = synthetic.systems_metadata(["pucp"])
+    stub.serve(meta)
+    return meta
+
+
+def settings(config, **kwargs):
+    return config.copy(update=dict(metadata=schemas.MetadataCache(**kwargs)))
+
+
+def systems(meta):
+    return [sys.sys for sys in meta.systems]
+
+
+def test_ttl_hit(config, stub, served):
+    meta = metadata.load(config)
+    assert systems(meta) == systems(served)
+    assert len(stub.gets) == len(metadata.ENDPOINTS)
+    assert metadata.snapshot_path(config).exists()
+
+    # a fresh snapshot is used without asking the API
+    again = metadata.load(config)
+    assert systems(again) == systems(served)
+    assert again.fetched == meta.fetched
+    assert len(stub.gets) == len(metadata.ENDPOINTS)
+
+
+@pytest.mark.parametrize(
+    "etag, last_modified", [('"v1"', None), (None, MODIFIED), ('"v1"', MODIFIED)]
+)
+def test_revalidation(config, stub, served, etag, last_modified):
+    stub.etag, stub.last_modified = etag, last_modified
+    config = settings(config, ttl=0)
+    meta = metadata.load(config)
+
+    # a stale snapshot is revalidated with its validators, 304 keeps its data
+    stub.gets.clear()
+    again = metadata.load(config)
+    assert systems(again) == systems(served)
+    assert again.fetched > meta.fetched
+    assert len(stub.gets) == len(metadata.ENDPOINTS)
+    for _, headers in stub.gets:
+        assert headers.get("If-None-Match") == etag
+        assert headers.get("If-Modified-Since") == last_modified
+
+    # changed on the API, the new data replaces the snapshot
+    stub.get["/processed/systems/"] = stub.get["/processed/systems/"][:1]
+    stub.etag = '"v2"' if etag else None
+    stub.last_modified = "Sat, 02 Mar 2024 00:00:00 GMT" if last_modified else None
+    changed = metadata.load(config)
+    assert systems(changed) == systems(served)[:1]
+    assert systems(metadata.load(settings(config, ttl=3600))) == systems(changed)
+
+
+@pytest.mark.parametrize("failure", ["error", "timeout"])
+def test_snapshot_fallback(config, stub, served, failure, capsys):
+    config = settings(config, ttl=0, timeout=0.2)
+    meta = metadata.load(config)
+
+    stub.get["/processed/systems/"] = []
+    if failure == "error":
+        stub.fail["systems"] = 500
+    else:
+        stub.get_delay = 1
+    # the API can't be used, the stale snapshot is
+    again = metadata.load(config)
+    assert systems(again) == systems(served)
+    assert again.fetched == meta.fetched
+    assert "using the snapshot" in capsys.readouterr().out
+
+
+def test_no_snapshot_error(config, stub, served):
+    stub.fail["locations"] = 500
+    with pytest.raises(requests.HTTPError):
+        metadata.load(config)
+    assert not metadata.snapshot_path(config).exists()
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import filters, quality, utils
+
+DAY = pd.Timestamp("2024-01-01").date()
+
+# minutes of the day with a valid value, 10:30 is minute 630 and 13:30 is 810
+CASES = dict(
+    empty=[],
+    full_day=list(range(360, 1080)),
+    single=[700],
+    # kept only with a value before 10:30 and one after 13:30
+    edges=list(range(629, 812)),
+    from_morning_edge=list(range(630, 812)),
+    to_afternoon_edge=list(range(629, 811)),
+    morning_only=list(range(300, 631)),
+    afternoon_only=list(range(810, 1100)),
+    # 200, 201 and 200 values over 251, 251 and 250 minutes
+    coverage_below=list(range(600, 799)) + [850],
+    coverage_above=list(range(600, 800)) + [850],
+    coverage_exact=list(range(600, 799)) + [849],
+)
+
+
+def _add(report: quality.Report, **labels):
+    n = len(quality.SERIES)
+    counts = np.zeros((utils.MINUTES, n), dtype=np.int64)
+    counts[600:700] = 60
+    rules = np.zeros((utils.MINUTES, n), dtype=np.int8)
+    report.add(DAY, counts, rules, np.zeros(n, dtype=bool), **labels)
+
+
+def test_empty_report():
+    df = quality.Report().frame()
+    assert len(df) == 0
+    assert list(df.columns) == list(quality.COLUMNS)
+
+
+def test_report_frame():
+    report = quality.Report()
+    _add(report, loc="pucp", sys="pucp-perc")
+    _add(report, loc="pucp", sys="pucp-hit")
+    df = report.frame()
+
+    assert list(df.columns) == ["loc", "sys"] + list(quality.COLUMNS)
+    assert len(df) == 2 * len(quality.SERIES)
+    assert (df["minutes"] == 100).all()
+    assert df.dtypes["minutes"] == quality.COLUMNS["minutes"]
+
+
+def test_report_labels_must_match():
+    report = quality.Report()
+    _add(report, loc="pucp", sys="pucp-perc")
+    with pytest.raises(ValueError):
+        _add(report, loc="pucp")
+
+    other = quality.Report()
+    _add(other)
+    with pytest.raises(ValueError):
+        report.merge(other)
+    # empty reports merge into any
+    report.merge(quality.Report())
+
+
+def _dts(day, minutes):
+    start = datetime.combine(day, datetime.min.time())
+    return [start + timedelta(minutes=m) for m in minutes]
+
+
+def _grid(minutes):
+    valid = np.zeros(utils.MINUTES, dtype=bool)
+    valid[minutes] = True
+    return valid
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_corroborate_as_measurement(name):
+    minutes = CASES[name]
+    expected = filters.corroborate_measurement(_dts(DAY, minutes), DAY)
+
+    reject = quality.corroborate_minutes(_grid(minutes)[:, None])
+    assert reject.tolist() == [expected]
+
+    reject = quality.corroborate(_dts(DAY, minutes))
+    if minutes:
+        assert reject.tolist() == [expected]
+    else:
+        # no timestamps, no day to reject
+        assert reject.empty
+
+
+def test_corroborate_many_series_and_days():
+    names = list(CASES)
+    days = [DAY + timedelta(days=i) for i in range(3)]
+    # every series gets a different case every day
+    plan = {
+        (s, day): names[(s + 2 * d) % len(names)]
+        for s in range(4)
+        for d, day in enumerate(days)
+    }
+
+    grid = np.zeros((len(days), utils.MINUTES, 4), dtype=bool)
+    dts, labels = [], []
+    for (s, day), name in plan.items():
+        grid[days.index(day), :, s] = _grid(CASES[name])
+        dts += _dts(day, CASES[name])
+        labels += [f"s{s}"] * len(CASES[name])
+
+    by_minutes = quality.corroborate_minutes(grid)
+    by_dt = quality.corroborate(dts, labels)
+    for (s, day), name in plan.items():
+        expected = filters.corroborate_measurement(_dts(day, CASES[name]), day)
+        assert by_minutes[days.index(day), s] == expected, name
+        if CASES[name]:
+            assert by_dt[(f"s{s}", pd.Timestamp(day))] == expected, name
@@ -0,0 +1,163 @@
+from datetime import date, time
+
+import numpy as np
+import pytest
+
+from processing import client, main, results, series, synthetic, utils
+
+DAY = date(2024, 3, 1)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = results.Results(tmp_path / "results.sqlite", attempts=3)
+    yield store
+    store.close()
+
+
+def test_series_round_trip(store):
+    data = series.MinuteSeries(DAY, [600, 601, 602], [1.5, 2.25, 1000.123456])
+    key = ("powers", "pucp-perc", "dc")
+
+    delta = store.series_delta(*key, data)
+    assert delta.minutes.tolist() == [600, 601, 602]
+    store.series_queued(*key, delta)
+    assert store.series_delta(*key, data).empty
+
+    # a changed and a new minute, the others were queued before
+    data = series.MinuteSeries(DAY, [600, 601, 602, 603], [1.5, 2.5, 1000.123456, 3])
+    delta = store.series_delta(*key, data)
+    assert delta.minutes.tolist() == [601, 603]
+    assert delta.values.tolist() == [2.5, 3]
+    store.series_queued(*key, delta)
+    assert store.series_delta(*key, data).empty
+
+    # other types and days are kept apart
+    assert len(store.series_delta("powers", "pucp-perc", "ac", data)) == 4
+    other = series.MinuteSeries(date(2024, 3, 2), data.minutes, data.values)
+    assert len(store.series_delta(*key, other)) == 4
+
+
+def test_kpi_changed(store):
+    fixed = dict(sys="pucp-perc", type="dc")
+    columns = dict(day=[DAY, date(2024, 3, 2)], val=[10.5, 11.25])
+
+    assert store.kpi_changed("energies", fixed, columns) == [0, 1]
+    store.kpi_queued("energies", fixed, columns)
+    assert store.kpi_changed("energies", fixed, columns) == []
+
+    columns["val"][1] = 12
+    assert store.kpi_changed("energies", fixed, columns) == [1]
+    assert store.kpi_changed("energies", dict(fixed, type="ac"), columns) == [0, 1]
+
+
+@pytest.mark.parametrize(
+    "status, rejected",
+    [(None, False), (408, False), (429, False), (503, False), (400, True), (422, True)],
+)
+def test_failed_status(store, status, rejected):
+    entry = store.put("http://api/powers/", b"{}", {})
+    store.failed(entry, status)
+    assert store.rejected(entry) == rejected
+    assert len(store.pending()) == (0 if rejected else 1)
+
+
+def test_failed_attempts(store):
+    entry = store.put("http://api/powers/", b"{}", {})
+    for _ in range(2):
+        store.failed(entry, 503)
+        assert not store.rejected(entry)
+    store.failed(entry, 503)
+    assert store.rejected(entry)
+    assert store.pending() == []
+
+    store.delivered(entry)
+    assert not store.rejected(entry)
+
+
+@pytest.fixture
+def day(tmp_path, config, stub):
+    # a synthetic day of pucp with one sample per minute, posted to the stub
+    config = config.copy(update=dict(results_path=tmp_path / "results.sqlite"))
+    meta = synthetic.write(config.local_folder, config, [DAY], ["pucp"], interval=60)
+
+    def run():
+        stub.posts.clear()
+        utils.clear_read_cache()
+        main.run(config, DAY, meta=meta)
+        client.configure()
+        return stub.posts
+
+    return config, meta, run
+
+
+def _change_power(config, sys, minute: time, factor: float):
+    # dc power of a minute of the raw file of the system
+    path = utils.sfcr_filepath(config.local_folder, sys.loc, sys.sfcr, sys.mod, DAY)
+    lines = path.read_text().splitlines()
+    for i, line in enumerate(lines):
+        fields = line.split(";")
+        if fields[1] == minute.strftime("%H:%M:%S"):
+            fields[4] = f"{float(fields[4]) * factor:.3f}"
+            lines[i] = ";".join(fields)
+    path.write_text("\n".join(lines) + "\n")
+
+
+def _powers(posts, sys: str, typ: str):
+    return [
+        body
+        for path, body in posts
+        if "powers" in path and body["sys"] == sys and body["type"] == typ
+    ]
+
+
+def test_rerun_and_changed_minute(day):
+    config, meta, run = day
+    posts = run()
+    assert len(posts) > 0
+
+    # nothing changed
+    assert run() == []
+
+    sys = meta.location_systems("pucp")[0]
+    _change_power(config, sys, time(10), 0.5)
+    posts = run()
+    (power,) = _powers(posts, sys.sys, "dc")
+    assert power["dt"] == [f"{DAY} 10:00:00"]
+    assert not any("irradiances" in path or "temperatures" in path for path, _ in posts)
+
+
+def test_failed_requests_are_replayed(day, stub):
+    config, meta, run = day
+    stub.fail["powers"] = 503
+    posts = run()
+    assert not any("powers" in path for path, _ in posts)
+    store = results.from_config(config)
+    failed = len(store.pending())
+    store.close()
+    assert failed == 2 * len(meta.location_systems("pucp"))
+
+    stub.fail.clear()
+    posts = run()
+    assert len(posts) == failed
+    assert all("powers" in path for path, _ in posts)
+
+
+def test_replay_keeps_the_order(day, stub):
+    # a minute changes while its first value is still in the outbox, the
+    # older value must not land after the newer one
+    config, meta, run = day
+    sys = meta.location_systems("pucp")[0]
+    stub.fail["powers"] = 503
+    run()
+    _change_power(config, sys, time(10), 0.5)
+    posts = run()
+    assert not any("powers" in path for path, _ in posts)
+
+    stub.fail.clear()
+    posts = run()
+    first, second = _powers(posts, sys.sys, "dc")
+    assert len(first["dt"]) > 1
+    assert second["dt"] == [f"{DAY} 10:00:00"]
+    minute = first["dt"].index(f"{DAY} 10:00:00")
+    assert np.isclose(second["val"][0], first["val"][minute] * 0.5, rtol=1e-3)
@@ -0,0 +1,34 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from processing import series
+
+DAY = date(2024, 3, 1)
+
+
+def test_from_array_to_json():
+    values = np.full(1440, np.nan)
+    values[[0, 359, 360, 1439]] = [1.23456, 0.0, -5.5, 1000.00004]
+    data = series.MinuteSeries.from_array(DAY, values)
+    assert len(data) == 4
+    assert data.minutes.tolist() == [0, 359, 360, 1439]
+
+    # the posted dt / val arrays, as the dt / val frame of the series
+    dct = data.to_json()
+    expected = pd.Series(pd.Timestamp(DAY) + pd.to_timedelta(data.minutes, "min"))
+    assert dct["dt"].tolist() == expected.astype(str).tolist()
+    assert dct["val"].tolist() == [1.2346, 0.0, -5.5, 1000.0]
+
+    # and back to every minute of the day
+    minutes = pd.to_datetime(dct["dt"]) - pd.Timestamp(DAY)
+    dense = np.full(1440, np.nan)
+    dense[(minutes // pd.Timedelta(minutes=1)).to_numpy()] = dct["val"]
+    assert np.allclose(dense, values.round(4), equal_nan=True)
+
+
+def test_from_array_empty():
+    data = series.MinuteSeries.from_array(DAY, np.full(1440, np.nan))
+    assert data.empty
+    assert data.to_json()["dt"].tolist() == []
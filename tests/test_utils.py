@@ -0,0 +1,50 @@
+import io
+
+import numpy as np
+
+from processing import utils
+
+NAMES = ["day", "time", "a", "b"]
+
+
+def _fold(text: str):
+    sums = np.zeros((utils.MINUTES, 2))
+    counts = np.zeros((utils.MINUTES, 2), dtype=np.int64)
+    last = utils.fold_csv(io.StringIO(text), NAMES, ["a", "b"], sums, counts, None)
+    return last, sums, counts
+
+
+def test_fold_csv_other_time_forms():
+    last, sums, counts = _fold(
+        "01/01/2024;09:00:01;1;2\n"
+        "01/01/2024;9:00:30;3;4\n"
+        "01/01/2024;09:01:00.500;5;6\n"
+        "01/01/2024;garbage;7;8\n"
+    )
+    assert last == 541
+    assert counts[540].tolist() == [2, 2]
+    assert sums[540].tolist() == [4, 6]
+    assert counts[541].tolist() == [1, 1]
+    # the row without a time is skipped
+    assert counts.sum() == 6
+
+
+def test_fold_csv_other_tokens_are_missing():
+    last, sums, counts = _fold(
+        "01/01/2024;09:00:00;1;NAN\n" "01/01/2024;09:00:10;err;4\n"
+    )
+    assert last == 540
+    assert counts[540].tolist() == [1, 1]
+    assert sums[540].tolist() == [1, 4]
+
+
+def test_fold_csv_garbage_times():
+    last, sums, counts = _fold(
+        "01/01/2024;\xff9:00:01;1;2\n"
+        "01/01/2024;;3;4\n"
+        "01/01/2024;99:99:99;5;6\n"
+        "01/01/2024;09:00:10;7;8\n"
+    )
+    assert last == 540
+    assert counts.sum() == 2
+    assert sums[540].tolist() == [7, 8]